@@ -1,5 +1,4 @@
 import os
-import random
 import sys
 
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
@@ -7,11 +6,9 @@ if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
 from autogen_core import MessageContext, RoutedAgent, message_handler
-from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.messages import TextMessage
 
 from main import messages
-from main.model_client import create_model_client
 
 
 class Agent(RoutedAgent):
@@ -34,18 +31,15 @@ class Agent(RoutedAgent):
 
     def __init__(self, name) -> None:
         super().__init__(name)
-        model_client = create_model_client(temperature=0.7)
-        self._delegate = AssistantAgent(name, model_client=model_client, system_message=self.system_message)
+        self._delegates = messages.Delegates(name, self.system_message, temperature=0.7)
 
     @message_handler
     async def handle_message(self, message: messages.Message, ctx: MessageContext) -> messages.Message:
-        print(f"{self.id.type}: Received message")
         text_message = TextMessage(content=message.content, source="user")
-        response = await self._delegate.on_messages([text_message], ctx.cancellation_token)
+        delegate = self._delegates.for_role(message.role)
+        response = await delegate.on_messages([text_message], ctx.cancellation_token)
         idea = response.chat_message.content
-        if random.random() < self.CHANCES_THAT_I_BOUNCE_IDEA_OFF_ANOTHER:
-            recipient = messages.find_recipient()
-            message = f"Here is my business idea. It may not be your speciality, but please refine it and make it better. {idea}"
-            response = await self.send_message(messages.Message(content=message), recipient)
-            idea = response.content
+        if await messages.should_bounce(self.CHANCES_THAT_I_BOUNCE_IDEA_OFF_ANOTHER, idea):
+            recipient = messages.find_recipient(idea)
+            idea = await messages.bounce(self, idea, recipient)
         return messages.Message(content=idea)
@@ -11,8 +11,27 @@ if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
 from main.gradio_app import create_interface
+from main import metrics
+from main import persona_pool
+from main import startup
 import gradio as gr
+from fastapi.responses import PlainTextResponse
+
+
+def _metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
+    startup.init()
+    # Keep agent definitions pre-generated while the server waits for clicks. Started here,
+    # not in create_interface(), so building the UI never starts making model calls
+    persona_pool.start()
     interface = create_interface()
-    interface.launch(theme=gr.themes.Soft(primary_hue="blue", secondary_hue="indigo"))
+    app, _, _ = interface.launch(
+        theme=gr.themes.Soft(primary_hue="blue", secondary_hue="indigo"),
+        prevent_thread_lock=True,
+    )
+    # Prometheus scrape target served by the same server as the UI
+    app.add_api_route("/metrics", _metrics_endpoint, methods=["GET"])
+    interface.block_thread()
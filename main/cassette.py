@@ -0,0 +1,263 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence
+
+from autogen_core.models import ChatCompletionClient, CreateResult, RequestUsage
+from pydantic import BaseModel
+
+from main import tracing
+
+# Record/replay of model traffic, configured from the environment:
+#   MODEL_CASSETTE_MODE=record  appends every model call to MODEL_CASSETTE_PATH
+#                               ({run_id} in the path gives one file per run)
+#   MODEL_CASSETTE_MODE=replay  serves calls from MODEL_CASSETTE_PATH without any provider
+#   MODEL_CASSETTE_SPEED=original|max  replay with recorded latencies or without waiting
+# Cassettes are gzip-compressed JSON lines, one call per line. The agents' random choices
+# (whether to bounce an idea, and to whom) are recorded alongside, so a replay makes the
+# same calls as the recording.
+
+# How long a replayed bounce waits for its recorded recipient to be registered
+RECIPIENT_WAIT_SECONDS = 60.0
+
+_lock = threading.Lock()
+_replay: Optional["CassetteReplay"] = None
+
+
+def mode() -> str:
+    return os.getenv("MODEL_CASSETTE_MODE", "").strip().lower()
+
+
+def request_key(role: str, messages: Sequence[Any]) -> str:
+    # Only type and content: sources are agent names, which differ between runs. Earlier turns
+    # are left out because an agent's history depends on the order other agents' refinement
+    # requests reached it; the system prompt and the new turn identify the request.
+    relevant = [message for message in messages[:-1] if type(message).__name__ == "SystemMessage"]
+    relevant += list(messages[-1:])
+    payload = [
+        [type(message).__name__, _jsonable(getattr(message, "content", None))] for message in relevant
+    ]
+    digest = hashlib.sha256(json.dumps([role, payload], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def record_call(
+    *,
+    role: str,
+    messages: Sequence[Any],
+    attempts: list[dict[str, Any]],
+    latency: float,
+    result: Optional[CreateResult],
+    error: Optional[str],
+) -> None:
+    """Append one routed model call (all provider attempts) to the cassette."""
+    entry = {
+        "role": role,
+        "key": request_key(role, messages),
+        "recorded_at": time.time(),
+        "run_id": tracing.current_run_id(),
+        "agent_id": tracing.current_agent_id(),
+        "latency": latency,
+        "attempts": attempts,
+        "request": [_jsonable(message) for message in messages],
+        "response": None if result is None else {
+            "content": _jsonable(result.content),
+            "finish_reason": result.finish_reason,
+            "prompt_tokens": result.usage.prompt_tokens,
+            "completion_tokens": result.usage.completion_tokens,
+            "thought": result.thought,
+        },
+        "error": error,
+    }
+    _append(entry)
+
+
+def record_decision(*, kind: str, key: str, value: Any) -> None:
+    """Append an agent's random choice ("bounce" or "recipient") for the input with this key."""
+    _append({
+        "decision": kind,
+        "key": key,
+        "value": value,
+        "recorded_at": time.time(),
+        "run_id": tracing.current_run_id(),
+        "agent_id": tracing.current_agent_id(),
+    })
+
+
+def _append(entry: dict[str, Any]) -> None:
+    path_template = os.getenv("MODEL_CASSETTE_PATH", "cassette.jsonl.gz")
+    path = path_template.replace("{run_id}", tracing.current_run_id() or "background")
+    line = json.dumps(entry, separators=(",", ":")) + "\n"
+    with _lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One gzip member per call keeps the file readable even if the process dies mid-run
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.write(line)
+
+
+class CassetteReplay:
+    """Hands out recorded responses and decisions, matched by content in recorded order.
+
+    Requests that no longer match exactly (e.g. a refinement of an idea that came back in a
+    different order) fall back to the next unused entry recorded for the same agent, then
+    for the same role or decision kind.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._queues: dict[tuple[str, ...], deque[dict[str, Any]]] = defaultdict(deque)
+        self._used: set[int] = set()
+        self._lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                kind = entry.get("decision") or entry["role"]
+                for queue_key in self._lookup_order(kind, entry["agent_id"], entry["key"]):
+                    self._queues[queue_key].append(entry)
+
+    @staticmethod
+    def _lookup_order(kind: str, agent_id: str, key: str) -> list[tuple[str, ...]]:
+        return [(kind, agent_id, key), (kind, agent_id), (kind,)]
+
+    def _next(self, kind: str, agent_id: str, key: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            for queue_key in self._lookup_order(kind, agent_id, key):
+                queue = self._queues.get(queue_key)
+                while queue:
+                    entry = queue.popleft()
+                    if id(entry) not in self._used:
+                        self._used.add(id(entry))
+                        return entry
+            return None
+
+    def next_entry(self, role: str, key: str) -> Optional[dict[str, Any]]:
+        return self._next(role, tracing.current_agent_id(), key)
+
+    def next_decision(self, kind: str, key: str) -> Optional[Any]:
+        """The recorded value of the current agent's next decision of this kind, if any."""
+        entry = self._next(kind, tracing.current_agent_id(), key)
+        return None if entry is None else entry["value"]
+
+
+def replay() -> CassetteReplay:
+    global _replay
+    with _lock:
+        if _replay is None:
+            _replay = CassetteReplay(os.getenv("MODEL_CASSETTE_PATH", "cassette.jsonl.gz"))
+        return _replay
+
+
+class ReplayChatCompletionClient(ChatCompletionClient):
+    """Plays recorded calls back offline, with their original latency unless speed is max."""
+
+    def __init__(self, *, role: str, model_info: dict[str, Any]) -> None:
+        self._role = role
+        self._model_info = model_info
+        self._original_speed = os.getenv("MODEL_CASSETTE_SPEED", "original").strip().lower() != "max"
+        self._protocol = "replay"
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    @property
+    def capabilities(self) -> dict[str, Any]:
+        return self._model_info
+
+    @property
+    def model_info(self) -> dict[str, Any]:
+        return self._model_info
+
+    @property
+    def protocol(self) -> str:
+        # Protocol the recorded call finally succeeded on, so metrics match the original run
+        return self._protocol
+
+    async def create(
+        self,
+        messages: Sequence[Any],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: bool | type[BaseModel] | None = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Any = None,
+    ) -> CreateResult:
+        entry = replay().next_entry(self._role, request_key(self._role, messages))
+        if entry is None:
+            raise RuntimeError(f"Cassette has no recorded {self._role} call left to replay")
+        if self._original_speed:
+            await asyncio.sleep(entry["latency"])
+        if entry["attempts"]:
+            self._protocol = entry["attempts"][-1]["protocol"]
+        response = entry["response"]
+        if response is None:
+            raise RuntimeError(f"Replayed model error: {entry['error']}")
+        usage = RequestUsage(
+            prompt_tokens=response["prompt_tokens"], completion_tokens=response["completion_tokens"]
+        )
+        self._actual_usage = usage
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + usage.prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + usage.completion_tokens,
+        )
+        return CreateResult(
+            finish_reason=response["finish_reason"],
+            content=response["content"],
+            usage=usage,
+            cached=False,
+            thought=response["thought"],
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[Any],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: bool | type[BaseModel] | None = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Any = None,
+    ) -> AsyncGenerator[str | CreateResult, None]:
+        async def stream() -> AsyncGenerator[str | CreateResult, None]:
+            result = await self.create(messages, cancellation_token=cancellation_token)
+            if isinstance(result.content, str):
+                yield result.content
+            yield result
+
+        return stream()
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._actual_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[Any], *, tools: Sequence[Any] = []) -> int:
+        return sum(len(str(getattr(message, "content", ""))) // 4 for message in messages)
+
+    def remaining_tokens(self, messages: Sequence[Any], *, tools: Sequence[Any] = []) -> int:
+        return max(0, 128_000 - self.count_tokens(messages))
@@ -3,3 +3,59 @@ OPENCODE_GO_OPENAI_BASE_URL = "https://opencode.ai/zen/go/v1"
 OPENCODE_GO_ANTHROPIC_BASE_URL = "https://opencode.ai/zen/go"
 
 TOTAL_AGENTS_CREATED_SIMULTANEOUSLY = 5
+
+# Agent runtime used by the pipeline: "grpc" (worker + local host) or "local" (in-process)
+AGENT_RUNTIME = "grpc"
+
+# Model roles: codegen (Creator), idea (first answer to the prompt), refine (bounced ideas)
+MODEL_ROLE_CODEGEN = "codegen"
+MODEL_ROLE_IDEA = "idea"
+MODEL_ROLE_REFINE = "refine"
+
+# Provider failover (see RoutedModelClient in main/model_client.py)
+ROUTING_WINDOW = 20
+ROUTING_MIN_SAMPLES = 3
+ROUTING_MAX_ERROR_RATE = 0.5
+ROUTING_LATENCY_FACTOR = 3.0
+# Samples older than this no longer count, and a demoted provider gets one probe call
+# (half-open) once it has gone this long without traffic, so a recovered provider returns
+ROUTING_SAMPLE_MAX_AGE_SECONDS = 300.0
+ROUTING_PROBE_SECONDS = 30.0
+
+# Shortest prompt Anthropic will cache (1024 tokens; 2048 on Haiku models). The Creator's
+# stable prefix is kept above it and a live call reporting fewer prompt tokens logs a warning
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# USD per million (input, output) tokens, keyed by model name; unknown models count as free
+MODEL_PRICES_PER_MILLION_TOKENS: dict[str, tuple[float, float]] = {}
+
+# Near-duplicate ideas (see main/similarity.py). An idea whose estimated
+# Jaccard similarity to an earlier one reaches the threshold is regenerated once with a
+# diversity hint ("regenerate") or dropped before it is stored ("drop").
+IDEA_DUPLICATE_THRESHOLD = 0.6
+IDEA_DUPLICATE_ACTION = "regenerate"
+# Kept ideas' signatures are stored in the run store; "all" also checks new ideas against
+# every earlier run, "run" only against the current one
+IDEA_DUPLICATE_SCOPE = "run"
+
+# Per-run fan-out and bounce probability (run_pipeline arguments and the UI's run settings).
+# Refined ideas can be bounced again, so a probability of 1 would never finish.
+MAX_AGENTS_PER_RUN = 10
+MAX_BOUNCE_PROBABILITY = 0.9
+
+# Pre-generated agent definitions kept ready for the Creator (see main/persona_pool.py).
+# Sized for the largest run, so even a full fan-out skips the codegen call for every agent;
+# refills only happen while the app is in use, so the extra entries cost little when idle.
+PERSONA_POOL_SIZE = MAX_AGENTS_PER_RUN
+PERSONA_POOL_MAX_AGE_SECONDS = 60 * 60
+PERSONA_POOL_RETRY_SECONDS = 30
+
+# Auto mode (see main/run_planner.py): pick the widest run whose estimate fits the budgets,
+# from the last AUTO_STATS_WINDOW successful calls per role in the run store
+AUTO_STATS_WINDOW = 200
+AUTO_BOUNCE_STEPS = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7)
+AUTO_LATENCY_QUANTILE = 0.9
+AUTO_RUN_OVERHEAD_SECONDS = 3.0
+# Per-call estimates used until a role has recorded calls
+AUTO_DEFAULT_CALL_SECONDS = {MODEL_ROLE_CODEGEN: 30.0, MODEL_ROLE_IDEA: 15.0, MODEL_ROLE_REFINE: 15.0}
+AUTO_DEFAULT_CALL_TOKENS = {MODEL_ROLE_CODEGEN: 2500, MODEL_ROLE_IDEA: 1000, MODEL_ROLE_REFINE: 1500}
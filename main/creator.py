@@ -1,26 +1,72 @@
-import importlib
+import functools
 import os
 import sys
+import types
 import logging
 import json
+from typing import Optional
 
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
 from autogen_core import MessageContext, RoutedAgent, message_handler
-from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.messages import TextMessage
 from autogen_core import TRACE_LOGGER_NAME
-from autogen_core import AgentId
+from autogen_core import AgentId, CancellationToken
+from autogen_core.models import ChatCompletionClient, SystemMessage, UserMessage
 
 from main import messages
-from main.model_client import create_model_client
+from main import metrics
+from main import persona_pool
+from main import run_store
+from main import similarity
+from main import tracing
+from main.constants import MODEL_ROLE_CODEGEN, PROMPT_CACHE_MIN_TOKENS
+from main.model_client import create_model_client, prompt_cache_usage
 
-logging.basicConfig(level=logging.WARNING)
+MAIN_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(MAIN_DIR, "agent.py")
+
+# Sent ahead of the template on every codegen call. Together with the system message and the
+# template it forms the stable prefix that provider prompt caching serves, which only works
+# above a minimum length (PROMPT_CACHE_MIN_TOKENS), so it spells out the template's contract
+# and the range of personas to draw from rather than leaving them implicit.
+TEMPLATE_RULES = """Rules for the generated code:
+- Keep the imports from the template. The agent talks to models only through its
+  messages.Delegates, and to other agents only through the helpers in main.messages.
+- Keep the class name Agent, its base class RoutedAgent and the __init__(self, name) signature.
+- Keep the handle_message signature, its @message_handler decorator and its return type
+  messages.Message. Keep self._delegates.for_role(message.role): ideas and refinement requests
+  are answered with their own model settings, and each model client is only built when needed.
+- Keep the bounce step as it is: await messages.should_bounce(...) before bouncing, then
+  messages.find_recipient(...) and await messages.bounce(...). should_bounce also checks the
+  idea for near-duplicates, so an agent that skips it wastes refinement calls.
+- Keep CHANCES_THAT_I_BOUNCE_IDEA_OFF_ANOTHER as a class attribute; the run sets its value.
+- Write the persona into system_message: sectors, what the agent is drawn to, what it avoids,
+  temperament, strengths and weaknesses, and how it presents ideas.
+- Don't read or write files, start threads or processes, or call the network directly.
+"""
+
+PERSONA_PALETTE = """Draw each persona from a different corner of this range, and combine freely:
+- Sectors: logistics and freight, agriculture and food supply, construction and property,
+  insurance, legal services, accounting and tax, manufacturing, retail and e-commerce,
+  hospitality and travel, media and entertainment, sports and fitness, public sector services,
+  telecoms, energy trading, personal finance, human resources and hiring, elder care,
+  veterinary care, fashion, gaming, scientific research, cybersecurity, automotive, aviation,
+  maritime, mining, nonprofit fundraising, local trades and home services.
+- Customers: solo professionals, small shops, family businesses, mid-size firms, enterprises,
+  city governments, schools, hospitals, consumers, hobby communities, other AI agents.
+- Drawn to: marketplaces, trust and verification, compliance, forecasting, negotiation,
+  matchmaking, coaching, logistics puzzles, hardware plus software, community building.
+- Temperament: cautious or bold, analytical or intuitive, frugal or ambitious, patient or
+  impulsive, contrarian or consensus-seeking, detail-oriented or big-picture.
+- Weaknesses: over-engineering, impatience, underestimating regulation, chasing trends,
+  ignoring distribution, perfectionism, reluctance to charge customers.
+"""
+
+# Handlers and level are set by main.startup.init()
 logger = logging.getLogger(TRACE_LOGGER_NAME)
-logger.addHandler(logging.StreamHandler())
-logger.setLevel(logging.DEBUG)
+log = logging.getLogger(__name__)
 
 
 class Creator(RoutedAgent):
@@ -42,45 +88,142 @@ class Creator(RoutedAgent):
 
     def __init__(self, name) -> None:
         super().__init__(name)
-        model_client = create_model_client(temperature=1.0)
-        self._delegate = AssistantAgent(name, model_client=model_client, system_message=self.system_message)
+        self._model_client = create_model_client(
+            temperature=1.0, role=MODEL_ROLE_CODEGEN, cache_prompt_prefix=True
+        )
 
     def get_user_prompt(self):
-        prompt = "Please generate a new Agent based strictly on this template. Stick to the class structure. \
-            Respond only with the python code, no other text, and no markdown code blocks.\n\n\
-            Be creative about taking the agent in a new direction, but don't change method signatures.\n\n\
-            Here is the template:\n\n"
-        with open("main/agent.py", "r", encoding="utf-8") as f:
-            template = f.read()
-        return prompt + template   
-        
+        return get_user_prompt()
+
 
     @message_handler
     async def handle_my_message_type(self, message: messages.Message, ctx: MessageContext) -> messages.Message:
-        # Support both legacy plain filename and JSON payload with {"filename", "prompt"}
+        # Support both legacy plain filename and JSON payload with {"filename", "prompt", "bounce_probability"}
         filename = message.content
         prompt = "Give me an idea"
+        bounce_probability = None
         try:
             parsed = json.loads(message.content)
             if isinstance(parsed, dict):
                 filename = parsed.get("filename", filename)
                 prompt = parsed.get("prompt", prompt)
+                bounce_probability = parsed.get("bounce_probability")
         except Exception:
             pass
         agent_name = filename.split(".")[0]
-        text_message = TextMessage(content=self.get_user_prompt(), source="user")
-        response = await self._delegate.on_messages([text_message], ctx.cancellation_token)
-        with open(f"main/{filename}", "w", encoding="utf-8") as f:
-            f.write(response.chat_message.content)
-        print(f"** Creator has created python code for agent {agent_name} - about to register with Runtime")
-        module = importlib.import_module(f"main.{agent_name}")
-        # Ensure generated Agent uses the provided prompt as its system_message
-        try:
-            setattr(module.Agent, "system_message", prompt)
-        except Exception:
-            pass
-        await module.Agent.register(self.runtime, agent_name, lambda: module.Agent(agent_name))
-        logger.info(f"** Agent {agent_name} is live")
-        # Use the provided prompt to message the new Agent
-        result = await self.send_message(messages.Message(content=prompt), AgentId(agent_name, "default"))
-        return messages.Message(content=result.content)
+        with tracing.span("creator.create_agent", run_id=message.run_id, agent_id=agent_name, parent=message.trace_parent):
+            # Personas don't depend on the prompt, so a pre-generated one can skip the codegen call
+            with tracing.span("creator.codegen") as attributes:
+                code = persona_pool.take()
+                attributes["pool_hit"] = code is not None
+                if code is None:
+                    try:
+                        code = await generate_agent_code(self._model_client, ctx.cancellation_token)
+                    except Exception:
+                        metrics.CODEGEN_FAILURES.inc(stage="generate")
+                        raise
+                    log.debug(f"** Creator prompt cache: {prompt_cache_usage(self._model_client)}")
+            with tracing.span("creator.import"):
+                # Not written to disk: the run store keeps the code for exports
+                log.info(f"** Creator has created python code for agent {agent_name} - about to register with Runtime")
+                try:
+                    module = _load_agent_module(agent_name, code)
+                except Exception:
+                    metrics.CODEGEN_FAILURES.inc(stage="import")
+                    raise
+            # Ensure generated Agent uses the provided prompt as its system_message
+            try:
+                setattr(module.Agent, "system_message", prompt)
+            except Exception:
+                pass
+            # Per-run bounce probability replaces whatever the generated persona chose
+            if bounce_probability is not None:
+                setattr(module.Agent, "CHANCES_THAT_I_BOUNCE_IDEA_OFF_ANOTHER", float(bounce_probability))
+            # Tracing and run context are added around the generated class, not left to its code
+            agent_class = messages.traced(module.Agent)
+            with tracing.span("creator.register"):
+                try:
+                    await agent_class.register(self.runtime, agent_name, lambda: agent_class(agent_name))
+                except Exception:
+                    metrics.CODEGEN_FAILURES.inc(stage="register")
+                    raise
+            run_store.record_agent(message.run_id, agent_name, code, pool_hit=attributes["pool_hit"])
+            logger.info(f"** Agent {agent_name} is live")
+            # Use the provided prompt to message the new Agent
+            request = messages.Message(
+                content=prompt, run_id=message.run_id, trace_parent=tracing.current_span_id()
+            )
+            agent_id = AgentId(agent_name, "default")
+            result = await self.send_message(request, agent_id)
+
+            # The agent checked its idea before bouncing it (messages.should_bounce); the
+            # drop-or-regenerate decision is made here
+            async def regenerate(hint: str) -> str:
+                retry = messages.Message(content=hint, run_id=message.run_id, trace_parent=tracing.current_span_id())
+                return (await self.send_message(retry, agent_id)).content
+
+            idea, duplicate_of = await similarity.deduplicate(message.run_id, agent_name, result.content, regenerate)
+        return messages.Message(content=idea, duplicate_of=duplicate_of)
+
+
+def _load_agent_module(agent_name: str, code: str) -> types.ModuleType:
+    # Executed from the code in hand rather than imported: the import cache would hand back the
+    # first run's agent in a long-lived process, and concurrent runs share the same filenames
+    filename = f"<generated {agent_name}>"
+    module = types.ModuleType(f"main.{agent_name}")
+    module.__file__ = filename
+    exec(compile(code, filename, "exec"), module.__dict__)
+    return module
+
+
+@functools.cache
+def get_user_prompt() -> str:
+    # Read once: the template is the bulk of the prompt prefix shared by every Creator call
+    prompt = "Please generate a new Agent based strictly on this template. Stick to the class structure. \
+        Respond only with the python code, no other text, and no markdown code blocks.\n\n\
+        Be creative about taking the agent in a new direction, but don't change method signatures.\n\n"
+    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    return f"{prompt}{TEMPLATE_RULES}\n{PERSONA_PALETTE}\nHere is the template:\n\n{template}"
+
+
+async def generate_agent_code(
+    model_client: ChatCompletionClient, cancellation_token: Optional[CancellationToken] = None
+) -> str:
+    """Ask the model for a fresh agent definition without going through the runtime.
+
+    Each call is stateless and sends the same system + template prefix, so provider prompt
+    caching can serve it after the first request.
+    """
+    cache_tokens_before = _cache_tokens(model_client)
+    result = await model_client.create(
+        [
+            SystemMessage(content=Creator.system_message),
+            UserMessage(content=get_user_prompt(), source="user"),
+        ],
+        cancellation_token=cancellation_token,
+    )
+    _check_cacheable_prefix(result.usage.prompt_tokens + _cache_tokens(model_client) - cache_tokens_before)
+    return result.content
+
+
+def _cache_tokens(model_client: ChatCompletionClient) -> int:
+    # Anthropic's input_tokens leaves out tokens read from or written to the cache
+    usage = prompt_cache_usage(model_client)
+    return usage.cached_prompt_tokens + usage.cache_creation_tokens if usage is not None else 0
+
+
+_prefix_checked = False
+
+
+def _check_cacheable_prefix(prompt_tokens: int) -> None:
+    # Once per process, from the first real usage report: the whole prompt is the stable prefix
+    global _prefix_checked
+    if _prefix_checked or not prompt_tokens:
+        return
+    _prefix_checked = True
+    if prompt_tokens < PROMPT_CACHE_MIN_TOKENS:
+        log.warning(
+            f"Creator prompt is {prompt_tokens} tokens, below the {PROMPT_CACHE_MIN_TOKENS}-token "
+            "minimum for prompt caching; codegen calls won't be served from the cache"
+        )
@@ -0,0 +1,211 @@
+import asyncio
+import math
+import os
+import random
+import zlib
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Mapping, Sequence
+
+from autogen_core.models import ChatCompletionClient, CreateResult, RequestUsage
+from pydantic import BaseModel
+
+from main import tracing
+from main.constants import MODEL_ROLE_CODEGEN, MODEL_ROLE_REFINE
+from main.messages import REFINE_REQUEST
+
+# Offline stand-in for the real providers, used by scripts/benchmark.py to measure the
+# pipeline without provider variance. Select it with USE_FAKE_MODEL=true.
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.py")
+
+# Canned ideas are assembled from these parts, picked per agent and call, so the ideas of
+# one run differ the way real ones do and aren't all dropped as near-duplicates
+IDEA_NAMES = [
+    "Care Navigator", "Freight Whisperer", "Harvest Planner", "Lease Guardian",
+    "Grant Scout", "Menu Engineer", "Repair Dispatcher", "Tutor Relay",
+]
+IDEA_CUSTOMERS = [
+    "patients, clinics and insurers", "small freight brokers and their carriers",
+    "family farms and their buyers", "landlords and tenants of small buildings",
+    "nonprofits chasing public funding", "independent restaurants and their suppliers",
+    "appliance repair shops and their customers", "evening tutors and the parents who hire them",
+]
+IDEA_PROBLEMS = [
+    "books appointments, follows up on results and keeps paperwork moving",
+    "negotiates rates, tracks every load and settles invoices on delivery",
+    "forecasts yields, plans planting and lines up buyers before harvest",
+    "screens applicants, schedules maintenance and chases late rent",
+    "finds matching calls, drafts applications and tracks every deadline",
+    "prices dishes from live costs, plans orders and cuts food waste",
+    "triages requests, routes technicians and orders parts ahead of the visit",
+    "matches students to tutors, plans lessons and reports progress every week",
+]
+IDEA_REFINEMENTS = [
+    "Refinement: start with one city and a flat monthly fee, then add usage pricing.",
+    "Refinement: add a human review step for anything that moves money.",
+    "Refinement: sell through the existing software vendors instead of direct.",
+    "Refinement: keep an audit log of every agent action to win over compliance teams.",
+]
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass
+class FakeModelConfig:
+    # Time to first token, in seconds: fixed, uniform (mean ± jitter), lognormal (jitter = sigma)
+    # or exponential (mean only)
+    latency_distribution: str = "lognormal"
+    latency_mean: float = 0.05
+    latency_jitter: float = 0.25
+    tokens_per_second: float = 2000.0
+    error_rate: float = 0.0
+    seed: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "FakeModelConfig":
+        seed = os.getenv("FAKE_MODEL_SEED")
+        return cls(
+            latency_distribution=os.getenv("FAKE_MODEL_LATENCY_DISTRIBUTION", cls.latency_distribution),
+            latency_mean=_env_float("FAKE_MODEL_LATENCY_MEAN", cls.latency_mean),
+            latency_jitter=_env_float("FAKE_MODEL_LATENCY_JITTER", cls.latency_jitter),
+            tokens_per_second=_env_float("FAKE_MODEL_TOKENS_PER_SECOND", cls.tokens_per_second),
+            error_rate=_env_float("FAKE_MODEL_ERROR_RATE", cls.error_rate),
+            seed=int(seed) if seed else None,
+        )
+
+
+def canned_agent_code() -> str:
+    # The template as-is: the Creator sets each run's bounce probability on the agent class
+    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _pick(options: list[str], key: str) -> str:
+    return options[zlib.crc32(key.encode("utf-8")) % len(options)]
+
+
+def canned_idea(key: str) -> str:
+    """A business idea assembled from the canned parts, the same every time for the same key."""
+    return (
+        f"# Agentic {_pick(IDEA_NAMES, key + ':name')}\n\n"
+        f"For {_pick(IDEA_CUSTOMERS, key + ':customer')}: an AI agent team that "
+        f"{_pick(IDEA_PROBLEMS, key + ':problem')}.\n"
+    )
+
+
+class FakeChatCompletionClient(ChatCompletionClient):
+    """Returns canned agent code (codegen role), a canned idea or a refinement of the idea
+    it was sent, after a sampled delay."""
+
+    def __init__(self, *, role: str, config: FakeModelConfig, model_info: dict[str, Any]) -> None:
+        self._role = role
+        self._config = config
+        self._model_info = model_info
+        self._random = random.Random(config.seed)
+        self._agent_code = canned_agent_code() if role == MODEL_ROLE_CODEGEN else ""
+        self._calls = 0
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    @property
+    def capabilities(self) -> dict[str, Any]:
+        return self._model_info
+
+    @property
+    def model_info(self) -> dict[str, Any]:
+        return self._model_info
+
+    @property
+    def protocol(self) -> str:
+        return "fake"
+
+    def _first_token_delay(self) -> float:
+        mean = self._config.latency_mean
+        jitter = self._config.latency_jitter
+        distribution = self._config.latency_distribution
+        if distribution == "fixed":
+            return mean
+        if distribution == "uniform":
+            return max(0.0, self._random.uniform(mean - jitter, mean + jitter))
+        if distribution == "exponential":
+            return self._random.expovariate(1.0 / mean) if mean > 0 else 0.0
+        if distribution == "lognormal":
+            # mu chosen so the distribution's mean equals latency_mean
+            mu = math.log(mean) - jitter ** 2 / 2 if mean > 0 else 0.0
+            return self._random.lognormvariate(mu, jitter) if mean > 0 else 0.0
+        raise ValueError(f"Unknown FAKE_MODEL_LATENCY_DISTRIBUTION: {distribution}")
+
+    def _content_for(self, messages: Sequence[Any]) -> str:
+        if self._role == MODEL_ROLE_CODEGEN:
+            return self._agent_code
+        self._calls += 1
+        key = f"{self._config.seed}:{tracing.current_agent_id()}:{self._calls}"
+        if self._role == MODEL_ROLE_REFINE:
+            request = str(getattr(messages[-1], "content", "")) if messages else ""
+            idea = request.partition(REFINE_REQUEST.split("{idea}")[0])[2] or canned_idea(key)
+            return f"{idea.rstrip()}\n\n{_pick(IDEA_REFINEMENTS, key)}\n"
+        return canned_idea(key)
+
+    def _usage_for(self, messages: Sequence[Any], content: str) -> RequestUsage:
+        return RequestUsage(
+            prompt_tokens=self.count_tokens(messages),
+            completion_tokens=max(1, len(content) // 4),
+        )
+
+    async def create(
+        self,
+        messages: Sequence[Any],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: bool | type[BaseModel] | None = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Any = None,
+    ) -> CreateResult:
+        content = self._content_for(messages)
+        usage = self._usage_for(messages, content)
+        delay = self._first_token_delay() + usage.completion_tokens / self._config.tokens_per_second
+        await asyncio.sleep(delay)
+        if self._random.random() < self._config.error_rate:
+            raise RuntimeError("Fake model error")
+        self._actual_usage = usage
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + usage.prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + usage.completion_tokens,
+        )
+        return CreateResult(finish_reason="stop", content=content, usage=usage, cached=False)
+
+    def create_stream(
+        self,
+        messages: Sequence[Any],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: bool | type[BaseModel] | None = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Any = None,
+    ) -> AsyncGenerator[str | CreateResult, None]:
+        async def stream() -> AsyncGenerator[str | CreateResult, None]:
+            result = await self.create(messages, cancellation_token=cancellation_token)
+            yield result.content
+            yield result
+
+        return stream()
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._actual_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[Any], *, tools: Sequence[Any] = []) -> int:
+        return sum(len(str(getattr(message, "content", ""))) // 4 for message in messages)
+
+    def remaining_tokens(self, messages: Sequence[Any], *, tools: Sequence[Any] = []) -> int:
+        return max(0, 128_000 - self.count_tokens(messages))
@@ -11,7 +11,10 @@ if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
 import gradio as gr
-from main.pipeline import run_pipeline
+from main import constants
+from main import run_planner
+from main import run_store
+from main import tracing
 
 # Single example replaced with the current system_message from main/agent.py
 EXAMPLE_PROMPTS = [
@@ -29,27 +32,77 @@ EXAMPLE_PROMPTS = [
 def _safe_markdown(md: Optional[str]) -> str:
     return md or "No idea content available."
 
-def run_pipeline_wrapper(agent_prompt: str):
+def lookup_run(run_id: str) -> str:
+    """Render a stored run's status and ideas as Markdown."""
+    run_id = (run_id or "").strip()
+    run = run_store.get_run(run_id) if run_id else None
+    if run is None:
+        return "No run found with that ID."
+    parts = [f"**Status:** {run['status']}"]
+    if run["duration_seconds"] is not None:
+        parts[0] += f" in {run['duration_seconds']:.1f}s"
+    for idea in run_store.ideas(run_id):
+        parts.append(f"---\n\n**{idea['agent_name']}**\n\n{idea['content']}")
+    return "\n\n".join(parts)
+
+def _plan_summary(plan: run_planner.RunPlan) -> str:
+    summary = (
+        f"Auto: {plan.how_many} agents, bounce {plan.bounce_probability:.0%}, "
+        f"~{plan.estimated_seconds:.0f}s, ~{plan.estimated_tokens:,} tokens"
+    )
+    return summary if plan.within_budget else summary + " (over budget)"
+
+def run_pipeline_wrapper(
+    agent_prompt: str,
+    mode: str = "Manual",
+    how_many: float = constants.TOTAL_AGENTS_CREATED_SIMULTANEOUSLY,
+    bounce_probability: float = 0.5,
+    latency_budget: Optional[float] = None,
+    token_budget: Optional[float] = None,
+):
+    # Auto mode picks the fan-out and bounce probability that fit the budgets; the estimate
+    # also paces the progress bar
+    total = 60.0  # 1 minute
+    plan_note = ""
+    if mode == "Auto" and not latency_budget and not token_budget:
+        plan_note = " (Auto mode needs a latency or token budget; using the manual settings)"
+    elif mode == "Auto":
+        plan = run_planner.plan_run(
+            latency_budget_seconds=latency_budget or None,
+            token_budget=int(token_budget) if token_budget else None,
+        )
+        how_many, bounce_probability = plan.how_many, plan.bounce_probability
+        total = max(total, plan.estimated_seconds)
+        plan_note = f" ({_plan_summary(plan)})"
+    how_many = int(how_many)
+
     # Initial state: show progress, keep result boxes hidden, disable button
     bar_len = 24
     pct = 1
     filled = int(bar_len * pct / 100)
     bar = ("█" * filled) + ("░" * (bar_len - filled))
     yield (
-        gr.update(value=f"[{bar}] {pct}% - Generating agents…", visible=True),
+        gr.update(value=f"[{bar}] {pct}% - Generating agents…{plan_note}", visible=True),
         gr.update(visible=False),  # results_col - initially hidden
         gr.update(value="", visible=False),   # agents_url_box
         gr.update(value="", visible=False),   # ideas_url_box
+        gr.update(value="", visible=False),   # run_id_box
         gr.update(visible=False),  # last_idea_md - no initial message
         gr.update(interactive=False, value="Running…")  # run_btn
     )
 
     result_holder = {"result": None}
     done = threading.Event()
+    run_id = tracing.new_run_id()
 
     def worker():
         try:
-            result_holder["result"] = run_pipeline(agent_prompt)
+            # Deferred so the UI can start serving before autogen and the model SDKs are loaded
+            from main.pipeline import run_pipeline
+
+            result_holder["result"] = run_pipeline(
+                agent_prompt, how_many=how_many, run_id=run_id, bounce_probability=bounce_probability
+            )
         finally:
             done.set()
 
@@ -57,7 +110,6 @@ def run_pipeline_wrapper(agent_prompt: str):
     t.start()
 
     start = time.time()
-    total = 60.0  # 1 minute
     last_pct = 1
 
     while not done.is_set():
@@ -69,11 +121,12 @@ def run_pipeline_wrapper(agent_prompt: str):
             bar = ("█" * filled) + ("░" * (bar_len - filled))
             status = "Generating agents…" if elapsed < (total / 2.0) else "Creating ideas…"
             yield (
-                gr.update(value=f"[{bar}] {pct}% - {status}", visible=True),
+                gr.update(value=f"[{bar}] {pct}% - {status}{plan_note}", visible=True),
                 gr.update(visible=False),  # Keep results_col hidden during processing
                 gr.update(visible=False),
                 gr.update(visible=False),
                 gr.update(visible=False),
+                gr.update(visible=False),
                 gr.update(interactive=False, value="Running…")
             )
         time.sleep(1.0)
@@ -98,6 +151,7 @@ def run_pipeline_wrapper(agent_prompt: str):
         gr.update(visible=bool(agents_url_valid or ideas_url_valid)),  # Show results only if we have URLs
         gr.update(value=agents_url_valid, visible=bool(agents_url_valid)),  # agents_url_box
         gr.update(value=ideas_url_valid, visible=bool(ideas_url_valid)),    # ideas_url_box
+        gr.update(value=run_id, visible=True),  # run_id_box
         gr.update(value=_safe_markdown(last_idea_md), visible=bool(last_idea_md)),  # last_idea_md
         gr.update(interactive=True, value="Auto generate agents")  # run_btn
     )
@@ -133,6 +187,21 @@ def create_interface():
                     label="Examples"
                 )
 
+        # Fan-out and bounce probability, set by hand or planned from latency/token budgets
+        with gr.Accordion("Run settings", open=False):
+            run_mode = gr.Radio(["Manual", "Auto"], value="Manual", label="Mode")
+            with gr.Row():
+                how_many = gr.Slider(
+                    1, constants.MAX_AGENTS_PER_RUN, value=constants.TOTAL_AGENTS_CREATED_SIMULTANEOUSLY,
+                    step=1, label="Agents",
+                )
+                bounce_probability = gr.Slider(
+                    0.0, constants.MAX_BOUNCE_PROBABILITY, value=0.5, step=0.05, label="Bounce probability",
+                )
+            with gr.Row():
+                latency_budget = gr.Number(value=None, label="Latency budget (seconds, Auto mode)")
+                token_budget = gr.Number(value=None, label="Token budget (Auto mode)")
+
         # Centered Run button
         with gr.Row(elem_classes=["center-row"]):
             run_btn = gr.Button("Run Pipeline", variant="primary", elem_id="run-btn")
@@ -169,6 +238,14 @@ def create_interface():
                         buttons=["copy"],
                     )
 
+            with gr.Row():
+                run_id_box = gr.Textbox(
+                    label="Run ID",
+                    interactive=False,
+                    elem_classes=["card"],
+                    buttons=["copy"],
+                )
+
             with gr.Row():
                 last_idea_md = gr.Markdown(
                     value="",
@@ -178,20 +255,29 @@ def create_interface():
                     elem_id="last_idea_md",
                 )
 
+        # Look up the stored ideas of an earlier run
+        with gr.Accordion("Past runs", open=False):
+            with gr.Row():
+                lookup_id = gr.Textbox(label="Run ID", placeholder="Paste a run ID...", scale=4)
+                lookup_btn = gr.Button("Load run", scale=1)
+            lookup_md = gr.Markdown(value="")
+
         # Connect the button to the pipeline
         run_btn.click(
             fn=run_pipeline_wrapper,
-            inputs=[agent_prompt],
+            inputs=[agent_prompt, run_mode, how_many, bounce_probability, latency_budget, token_budget],
             outputs=[
                 progress_md,
                 results_col,
                 agents_url_box,
                 ideas_url_box,
+                run_id_box,
                 last_idea_md,
                 run_btn
             ],
             show_progress="hidden",
         )
+        lookup_btn.click(fn=lookup_run, inputs=[lookup_id], outputs=[lookup_md])
 
         # Custom CSS for the app
         demo.css = """
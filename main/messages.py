@@ -1,30 +1,169 @@
 from dataclasses import dataclass
-from autogen_core import AgentId
-import glob
-import os
+from typing import Any, Optional
+from autogen_core import AgentId, MessageContext, RoutedAgent
+import asyncio
+import contextvars
+import logging
 import random
+import time
+
+from main import cassette
+from main import metrics
+from main import run_store
+from main import similarity
+from main import tracing
+from main.constants import MODEL_ROLE_IDEA, MODEL_ROLE_REFINE
+
+logger = logging.getLogger(__name__)
+
+REFINE_REQUEST = "Here is my business idea. It may not be your speciality, but please refine it and make it better. {idea}"
 
 @dataclass
 class Message:
     content: str
+    # Model role the recipient should answer with (idea or refine)
+    role: str = MODEL_ROLE_IDEA
+    # Tracing context carried across the agent runtime (see main/tracing.py)
+    run_id: str = ""
+    trace_parent: str = ""
+    # Set on a reply whose idea was dropped as a near-duplicate of this agent's (see main/similarity.py)
+    duplicate_of: str = ""
+
+
+# Role of the Message the current agent is handling, set by traced()
+_role: contextvars.ContextVar[str] = contextvars.ContextVar("message_role", default="")
+
+
+# Model clients created by each run's agents, closed by close_run() when the run's agents are done
+_run_clients: dict[str, list[Any]] = {}
+
+
+class Delegates:
+    """An agent's AssistantAgents, one per model role (idea or refine), each built on first use.
+
+    An agent only pays for the clients of the roles it is actually asked to answer: one that
+    never receives a refinement request never builds the refine client.
+    """
+
+    def __init__(self, name: str, system_message: str, temperature: float = 0.7) -> None:
+        self._name = name
+        self._system_message = system_message
+        self._temperature = temperature
+        self._delegates: dict[str, Any] = {}
+
+    def for_role(self, role: str) -> Any:
+        delegate = self._delegates.get(role)
+        if delegate is None:
+            # Imported here so loading this module doesn't pull in agentchat and the model SDKs
+            from autogen_agentchat.agents import AssistantAgent
+            from main.model_client import create_model_client
+
+            model_client = create_model_client(temperature=self._temperature, role=role)
+            _run_clients.setdefault(tracing.current_run_id(), []).append(model_client)
+            delegate = AssistantAgent(self._name, model_client=model_client, system_message=self._system_message)
+            self._delegates[role] = delegate
+        return delegate
+
+
+async def close_run(run_id: str) -> None:
+    """Close the model clients the run's agents created."""
+    for model_client in _run_clients.pop(run_id, []):
+        try:
+            await model_client.close()
+        except Exception as e:
+            logger.warning(f"Failed to close model client: {e}")
+
 
+def _replayed(kind: str, text: str) -> Optional[Any]:
+    if cassette.mode() != "replay":
+        return None
+    return cassette.replay().next_decision(kind, cassette.text_key(text))
 
-def find_recipient() -> AgentId:
+
+def _record(kind: str, text: str, value: Any) -> None:
+    if cassette.mode() == "record":
+        cassette.record_decision(kind=kind, key=cassette.text_key(text), value=value)
+
+
+async def should_bounce(probability: float, idea: str) -> bool:
+    """Random choice to bounce an idea; recorded to, and replayed from, a model cassette.
+
+    An agent's own idea (not a refinement it was asked for) is checked for near-duplicates
+    first, and a duplicate is never bounced, so no refinement calls are spent on it.
+    """
+    if _role.get() == MODEL_ROLE_IDEA:
+        if await similarity.check(tracing.current_run_id(), tracing.current_agent_id(), idea) is not None:
+            return False
+    replayed = _replayed("bounce", idea)
+    if replayed is not None:
+        return bool(replayed)
+    decision = random.random() < probability
+    _record("bounce", idea, decision)
+    return decision
+
+
+def find_recipient(idea: str = "") -> AgentId:
+    replayed = _replayed("recipient", idea)
+    if replayed is not None:
+        logger.info(f"Selecting agent for refinement: {replayed}")
+        return AgentId(replayed, "default")
     try:
-        # Look for agent Python files in the same directory as this file (i.e. the `main` package)
-        main_dir = os.path.dirname(__file__)
-        agent_files = glob.glob(os.path.join(main_dir, "agent*.py"))
-        # Extract just the base filename (without directory and extension)
-        agent_names = [os.path.splitext(os.path.basename(file))[0] for file in agent_files]
-        # Remove the template `agent.py` if it exists in the list
-        if "agent" in agent_names:
-            agent_names.remove("agent")
+        # Agents registered by the Creator for the current run, from the run store
+        agent_names = run_store.agent_names(tracing.current_run_id())
         # If no dynamically-generated agents exist yet, fall back gracefully
         if not agent_names:
             raise ValueError("No generated agents found")
         agent_name = random.choice(agent_names)
-        print(f"Selecting agent for refinement: {agent_name}")
+        logger.info(f"Selecting agent for refinement: {agent_name}")
+        _record("recipient", idea, agent_name)
         return AgentId(agent_name, "default")
     except Exception as e:
-        print(f"Exception finding recipient: {e}")
+        logger.warning(f"Exception finding recipient: {e}")
         return AgentId("agent1", "default")
+
+
+async def _wait_for_agent(agent_name: str) -> None:
+    # A replay can run ahead of the recording, so the recorded recipient may not exist yet
+    deadline = time.monotonic() + cassette.RECIPIENT_WAIT_SECONDS
+    while agent_name not in run_store.agent_names(tracing.current_run_id()) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def bounce(agent: RoutedAgent, idea: str, recipient: AgentId) -> str:
+    """Ask another agent to refine an idea, and return the refined idea."""
+    if cassette.mode() == "replay":
+        await _wait_for_agent(recipient.type)
+    metrics.BOUNCES.inc()
+    started = time.perf_counter()
+    with tracing.span("agent.refinement_hop", recipient=recipient.type):
+        request = Message(
+            content=REFINE_REQUEST.format(idea=idea), role=MODEL_ROLE_REFINE,
+            run_id=tracing.current_run_id(), trace_parent=tracing.current_span_id(),
+        )
+        response = await agent.send_message(request, recipient)
+    run_store.record_hop(tracing.current_run_id(), agent.id.type, recipient.type, (time.perf_counter() - started) * 1000.0)
+    return response.content
+
+
+def traced(agent_class: type[RoutedAgent]) -> type[RoutedAgent]:
+    """Subclass of a generated Agent class that handles each Message inside a span.
+
+    The span restores the run and agent context that the runtime doesn't carry, so tracing,
+    model call records and bounce() work without any help from the generated code.
+    """
+
+    async def on_message_impl(self: RoutedAgent, message: Any, ctx: MessageContext) -> Any:
+        if not isinstance(message, Message):
+            return await agent_class.on_message_impl(self, message, ctx)
+        logger.debug(f"{self.id.type}: Received {message.role} message")
+        token = _role.set(message.role)
+        try:
+            with tracing.span(
+                "agent.handle_message", run_id=message.run_id, agent_id=self.id.type,
+                parent=message.trace_parent, role=message.role,
+            ):
+                return await agent_class.on_message_impl(self, message, ctx)
+        finally:
+            _role.reset(token)
+
+    return type(agent_class.__name__, (agent_class,), {"on_message_impl": on_message_impl})
@@ -0,0 +1,202 @@
+import bisect
+import threading
+from typing import Callable, Iterable, Optional
+
+# Minimal in-process metrics rendered in the Prometheus text exposition format.
+# main/app.py serves render() at /metrics next to the Gradio UI.
+
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_BUCKETS = (1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000)
+COST_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """Unlabelled value read from a callback at scrape time, so it is never stale."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        with self._lock:
+            self._function = function
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            function = self._function
+        if function is None:
+            return []
+        return [f"{self.name} {_format_number(function())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labels: Iterable[str] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self._buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self._buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+_registry: list[_Metric] = []
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+MODEL_CALL_SECONDS = Histogram(
+    "model_call_duration_seconds", "Latency of successful model calls.", ("protocol", "model", "role")
+)
+MODEL_CALL_ERRORS = Counter(
+    "model_call_errors_total", "Model calls that failed on a provider.", ("provider", "model", "role")
+)
+PROMPT_TOKENS = Counter("model_prompt_tokens_total", "Prompt tokens sent to models.", ("model", "role"))
+COMPLETION_TOKENS = Counter(
+    "model_completion_tokens_total", "Completion tokens returned by models.", ("model", "role")
+)
+CACHED_PROMPT_TOKENS = Counter(
+    "model_cached_prompt_tokens_total", "Prompt tokens served from the provider prompt cache.", ("protocol",)
+)
+PROTOCOL_FAILOVERS = Counter(
+    "model_protocol_failovers_total", "OpenCode Go calls retried on the other API style.", ("model",)
+)
+PROVIDER_FAILOVERS = Counter(
+    "model_provider_failovers_total", "Model calls that moved on to the next provider.", ("role",)
+)
+AGENT_SECONDS = Histogram("agent_duration_seconds", "Time from asking the Creator for an agent to its idea.")
+RUN_SECONDS = Histogram("run_duration_seconds", "End-to-end latency of a pipeline run.")
+RUN_TOKENS = Histogram("run_tokens", "Prompt plus completion tokens used by a pipeline run.", buckets=TOKEN_BUCKETS)
+RUN_COST_USD = Histogram("run_cost_usd", "Estimated model cost of a pipeline run.", buckets=COST_BUCKETS)
+BOUNCES = Counter("agent_bounces_total", "Ideas bounced to another agent for refinement.")
+CODEGEN_FAILURES = Counter(
+    "codegen_failures_total", "Generated agents that could not be produced, imported or registered.", ("stage",)
+)
+PERSONA_POOL_LOOKUPS = Counter("persona_pool_lookups_total", "Persona pool lookups by outcome.", ("result",))
+PERSONA_POOL_SIZE = Gauge("persona_pool_size", "Agent definitions ready in the persona pool.")
+PERSONA_POOL_REFILL_LAG_SECONDS = Gauge(
+    "persona_pool_refill_lag_seconds", "How long the persona pool has been below its target size while in use."
+)
+IDEA_DUPLICATES = Counter(
+    "idea_duplicates_total", "Near-duplicate ideas by outcome (regenerated or dropped).", ("outcome",)
+)
+UPLOAD_BYTES = Counter("upload_bytes_total", "Bytes of zipped artifacts uploaded to GCS.", ("prefix",))
+
+_run_usage: dict[str, list[float]] = {}
+_run_usage_lock = threading.Lock()
+
+
+def start_run(run_id: str) -> None:
+    with _run_usage_lock:
+        _run_usage[run_id] = [0, 0.0]
+
+
+def record_run_usage(run_id: str, tokens: int, cost_usd: float) -> None:
+    with _run_usage_lock:
+        usage = _run_usage.get(run_id)
+        if usage is not None:
+            usage[0] += tokens
+            usage[1] += cost_usd
+
+
+def finish_run(run_id: str, seconds: float) -> Optional[tuple[int, float]]:
+    """Observe a finished run and return its (tokens, cost_usd)."""
+    with _run_usage_lock:
+        usage = _run_usage.pop(run_id, None)
+    RUN_SECONDS.observe(seconds)
+    if usage is None:
+        return None
+    tokens, cost_usd = int(usage[0]), usage[1]
+    RUN_TOKENS.observe(tokens)
+    RUN_COST_USD.observe(cost_usd)
+    return tokens, cost_usd
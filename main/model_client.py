@@ -1,27 +1,41 @@
+import logging
 import os
-from typing import Any, AsyncGenerator, Mapping, Sequence
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncGenerator, Iterable, Mapping, Optional, Sequence
 
 from autogen_core.models import ChatCompletionClient, CreateResult, RequestUsage
 from autogen_ext.models.openai import OpenAIChatCompletionClient
-from dotenv import load_dotenv
 from pydantic import BaseModel
 
+from main import cassette
+from main import metrics
+from main import run_store
+from main import startup
+from main import tracing
 from main.constants import (
+    MODEL_PRICES_PER_MILLION_TOKENS,
+    MODEL_ROLE_IDEA,
     OPENCODE_GO_ANTHROPIC_BASE_URL,
     OPENCODE_GO_OPENAI_BASE_URL,
     OPENROUTER_BASE_URL,
+    ROUTING_LATENCY_FACTOR,
+    ROUTING_MAX_ERROR_RATE,
+    ROUTING_MIN_SAMPLES,
+    ROUTING_PROBE_SECONDS,
+    ROUTING_SAMPLE_MAX_AGE_SECONDS,
+    ROUTING_WINDOW,
 )
 
-try:
-    from autogen_ext.models.anthropic import AnthropicChatCompletionClient
-except ImportError:  # pragma: no cover - caught early when OpenCode Anthropic models are used.
-    AnthropicChatCompletionClient = None
-
-load_dotenv(override=True)
 
 DEFAULT_OPENROUTER_MODEL = "x-ai/grok-4-fast:free"
 DEFAULT_OPENCODE_GO_MODEL = "minimax-m2.7"
 
+logger = logging.getLogger(__name__)
+
 MODEL_INFO = {
     "family": "unknown",
     "vision": False,
@@ -30,12 +44,7 @@ MODEL_INFO = {
     "structured_output": False,
 }
 
-
-def _env_bool(name: str, default: bool = False) -> bool:
-    value = os.getenv(name)
-    if value is None:
-        return default
-    return value.strip().lower() in {"1", "true", "yes", "y", "on"}
+CACHE_CONTROL = {"type": "ephemeral"}
 
 
 def _env_required(name: str) -> str:
@@ -45,6 +54,132 @@ def _env_required(name: str) -> str:
     return value
 
 
+@dataclass
+class PromptCacheUsage:
+    cached_prompt_tokens: int = 0
+    cache_creation_tokens: int = 0
+
+
+def _with_cache_breakpoint(content: Any) -> list[dict[str, Any]]:
+    if isinstance(content, str):
+        return [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+    blocks = [dict(block) for block in content]
+    if blocks:
+        blocks[-1]["cache_control"] = CACHE_CONTROL
+    return blocks
+
+
+class _AnthropicPromptCache:
+    """Stands in for the Anthropic SDK `messages` resource used by AnthropicChatCompletionClient.
+
+    Autogen sends the system prompt as a plain string and drops cache counters from usage,
+    so breakpoints are added to the system prompt and first user turn here, and cache
+    reads/writes are recorded from the raw response.
+    """
+
+    def __init__(self, messages: Any, usage: PromptCacheUsage, cache_prefix: bool) -> None:
+        self._messages = messages
+        self._usage = usage
+        self._cache_prefix = cache_prefix
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._messages, name)
+
+    async def create(self, **request_args: Any) -> Any:
+        if self._cache_prefix:
+            request_args = dict(request_args)
+            if request_args.get("system"):
+                request_args["system"] = _with_cache_breakpoint(request_args["system"])
+            chat = list(request_args.get("messages", []))
+            if chat and chat[0].get("role") == "user":
+                chat[0] = {**chat[0], "content": _with_cache_breakpoint(chat[0]["content"])}
+                request_args["messages"] = chat
+        result = await self._messages.create(**request_args)
+        usage = getattr(result, "usage", None)
+        if usage is not None:
+            cached_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+            self._usage.cached_prompt_tokens += cached_tokens
+            metrics.CACHED_PROMPT_TOKENS.inc(cached_tokens, protocol="anthropic")
+            self._usage.cache_creation_tokens += getattr(usage, "cache_creation_input_tokens", None) or 0
+        return result
+
+
+class _OpenAIPromptCache:
+    """Stands in for the OpenAI SDK `chat.completions` resource to record cached prompt tokens.
+
+    OpenAI-compatible providers cache automatically on a stable prefix, so requests are
+    passed through unchanged.
+    """
+
+    def __init__(self, completions: Any, usage: PromptCacheUsage) -> None:
+        self._completions = completions
+        self._usage = usage
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._completions, name)
+
+    async def create(self, **request_args: Any) -> Any:
+        result = await self._completions.create(**request_args)
+        details = getattr(getattr(result, "usage", None), "prompt_tokens_details", None)
+        if details is not None:
+            cached_tokens = getattr(details, "cached_tokens", None) or 0
+            self._usage.cached_prompt_tokens += cached_tokens
+            metrics.CACHED_PROMPT_TOKENS.inc(cached_tokens, protocol="openai")
+        return result
+
+
+# Autogen has no public hook for cache breakpoints or cached-token counts (its Anthropic
+# client sends the system prompt as a plain string and forwards only a few create args), so
+# the SDK resource on its private `_client` is wrapped in place. This matches autogen-ext
+# 0.7.5, pinned in requirements.txt; if an upgrade changes that shape, prompt caching is left
+# off with a warning rather than failing silently or breaking the calls themselves.
+
+
+def _sdk_resource_owner(client: Any, owner_path: tuple[str, ...], name: str, expected: type) -> Optional[Any]:
+    owner = getattr(client, "_client", None)
+    for attribute in owner_path:
+        owner = getattr(owner, attribute, None)
+    resource = getattr(owner, name, None)
+    if not isinstance(resource, expected):
+        logger.warning(
+            f"Prompt cache tracking disabled: {type(client).__name__}._client.{'.'.join(owner_path + (name,))} "
+            f"is {type(resource).__name__}, expected {expected.__name__} (autogen-ext upgrade?)"
+        )
+        return None
+    return owner
+
+
+def _track_openai_prompt_cache(client: OpenAIChatCompletionClient, usage: PromptCacheUsage) -> None:
+    from openai.resources.chat import AsyncCompletions
+
+    chat = _sdk_resource_owner(client, ("chat",), "completions", AsyncCompletions)
+    if chat is not None:
+        chat.completions = _OpenAIPromptCache(chat.completions, usage)
+
+
+def _track_anthropic_prompt_cache(client: Any, usage: PromptCacheUsage, cache_prefix: bool) -> None:
+    from anthropic.resources import AsyncMessages
+
+    sdk_client = _sdk_resource_owner(client, (), "messages", AsyncMessages)
+    if sdk_client is not None:
+        sdk_client.messages = _AnthropicPromptCache(sdk_client.messages, usage, cache_prefix)
+
+
+class OpenRouterClient(OpenAIChatCompletionClient):
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._cache_usage = PromptCacheUsage()
+        _track_openai_prompt_cache(self, self._cache_usage)
+
+    @property
+    def protocol(self) -> str:
+        return "openai"
+
+    def cache_usage(self) -> PromptCacheUsage:
+        return self._cache_usage
+
+
 class OpenCodeGoAutoClient(ChatCompletionClient):
     _protocol_cache: dict[str, str] = {}
 
@@ -57,6 +192,7 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
         anthropic_base_url: str,
         temperature: float,
         api_style: str = "auto",
+        cache_prompt_prefix: bool = False,
     ) -> None:
         self._model = model
         self._api_style = api_style.strip().lower()
@@ -70,15 +206,17 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
             model_info=MODEL_INFO,
             temperature=temperature,
         )
-        self._anthropic_client = None
-        if AnthropicChatCompletionClient is not None:
-            self._anthropic_client = AnthropicChatCompletionClient(
-                model=model,
-                base_url=anthropic_base_url,
-                api_key=api_key,
-                model_info=MODEL_INFO,
-                temperature=temperature,
-            )
+        self._cache_usage = PromptCacheUsage()
+        _track_openai_prompt_cache(self._openai_client, self._cache_usage)
+        self._anthropic_client: Optional[ChatCompletionClient] = None
+        self._anthropic_args = {
+            "model": model,
+            "base_url": anthropic_base_url,
+            "api_key": api_key,
+            "model_info": MODEL_INFO,
+            "temperature": temperature,
+        }
+        self._cache_prompt_prefix = cache_prompt_prefix
 
         self._active_protocol = self._initial_protocol()
 
@@ -90,6 +228,10 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
     def model_info(self) -> dict[str, Any]:
         return MODEL_INFO
 
+    @property
+    def protocol(self) -> str:
+        return self._active_protocol
+
     def _initial_protocol(self) -> str:
         if self._api_style != "auto":
             return self._api_style
@@ -103,8 +245,16 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
         if protocol == "openai":
             return self._openai_client
         if self._anthropic_client is None:
-            raise RuntimeError(
-                "OpenCode Go Anthropic-style models require autogen-ext[anthropic]."
+            # Built on first use: the Anthropic SDK is the slowest import in the app
+            try:
+                from autogen_ext.models.anthropic import AnthropicChatCompletionClient
+            except ImportError as e:
+                raise RuntimeError(
+                    "OpenCode Go Anthropic-style models require autogen-ext[anthropic]."
+                ) from e
+            self._anthropic_client = AnthropicChatCompletionClient(**self._anthropic_args)
+            _track_anthropic_prompt_cache(
+                self._anthropic_client, self._cache_usage, self._cache_prompt_prefix
             )
         return self._anthropic_client
 
@@ -139,6 +289,7 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
                 raise
             first_protocol = self._active_protocol
             self._active_protocol = self._alternate_protocol()
+            metrics.PROTOCOL_FAILOVERS.inc(model=self._model)
             try:
                 result = await self._client_for(self._active_protocol).create(
                     messages, **create_args
@@ -180,6 +331,7 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
                 if self._api_style != "auto":
                     raise
                 self._active_protocol = self._alternate_protocol()
+                metrics.PROTOCOL_FAILOVERS.inc(model=self._model)
                 async for chunk in self._client_for(
                     self._active_protocol
                 ).create_stream(messages, **stream_args):
@@ -208,6 +360,9 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
             ),
         )
 
+    def cache_usage(self) -> PromptCacheUsage:
+        return self._cache_usage
+
     def count_tokens(
         self, messages: Sequence[Any], *, tools: Sequence[Any] = []
     ) -> int:
@@ -223,21 +378,420 @@ class OpenCodeGoAutoClient(ChatCompletionClient):
         )
 
 
-def create_model_client(*, temperature: float) -> ChatCompletionClient:
-    if _env_bool("USE_OPENROUTER", default=False):
-        return OpenAIChatCompletionClient(
-            model=os.getenv("OPENROUTER_MODEL", DEFAULT_OPENROUTER_MODEL),
+class ProviderHealth:
+    """Rolling window of recent call outcomes for one provider and role, shared across clients.
+
+    Kept per role because roles use different models and prompt sizes: codegen calls are far
+    slower than idea calls, so a pooled median would compare a provider's codegen latency with
+    another's idea latency.
+    """
+
+    def __init__(self, window: int) -> None:
+        self._samples: deque[tuple[float, bool, float]] = deque(maxlen=window)
+        self._last_attempt = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, latency: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._samples.append((now, ok, latency))
+            self._last_attempt = now
+
+    def _recent(self) -> list[tuple[bool, float]]:
+        cutoff = time.monotonic() - ROUTING_SAMPLE_MAX_AGE_SECONDS
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return [(ok, latency) for _, ok, latency in self._samples]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            samples = self._recent()
+        if len(samples) < ROUTING_MIN_SAMPLES:
+            return 0.0
+        return sum(1 for ok, _ in samples if not ok) / len(samples)
+
+    def median_latency(self) -> Optional[float]:
+        with self._lock:
+            latencies = [latency for ok, latency in self._recent() if ok]
+        if len(latencies) < ROUTING_MIN_SAMPLES:
+            return None
+        return statistics.median(latencies)
+
+    def claim_probe(self) -> bool:
+        """True for one caller once the provider has had no traffic for ROUTING_PROBE_SECONDS."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_attempt < ROUTING_PROBE_SECONDS:
+                return False
+            self._last_attempt = now
+            return True
+
+
+@dataclass
+class RoleStats:
+    calls: int = 0
+    errors: int = 0
+    latency_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+
+_provider_health: dict[tuple[str, str], ProviderHealth] = {}
+_role_stats: dict[str, RoleStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _health_for(provider: str, role: str) -> ProviderHealth:
+    with _stats_lock:
+        key = (provider, role)
+        if key not in _provider_health:
+            _provider_health[key] = ProviderHealth(ROUTING_WINDOW)
+        return _provider_health[key]
+
+
+def _call_cost(model: str, usage: RequestUsage) -> float:
+    prices = MODEL_PRICES_PER_MILLION_TOKENS.get(model)
+    if prices is None:
+        return 0.0
+    input_price, output_price = prices
+    return (usage.prompt_tokens * input_price + usage.completion_tokens * output_price) / 1_000_000
+
+
+def _record_call(
+    role: str, provider: "_Provider", latency: float, usage: Optional[RequestUsage] = None
+) -> None:
+    _health_for(provider.name, role).record(usage is not None, latency)
+    # Calls outside a run (persona pool refills) only count towards health and role stats
+    run_id = tracing.current_run_id()
+    if usage is None:
+        metrics.MODEL_CALL_ERRORS.inc(provider=provider.name, model=provider.model, role=role)
+        if run_id:
+            run_store.record_model_call(
+                run_id=run_id, agent_name=tracing.current_agent_id(), role=role,
+                provider=provider.name, model=provider.model, ok=False, latency_seconds=latency,
+            )
+        with _stats_lock:
+            stats = _role_stats.setdefault(role, RoleStats())
+            stats.calls += 1
+            stats.errors += 1
+            stats.latency_seconds += latency
+        return
+    cost = _call_cost(provider.model, usage)
+    protocol = getattr(provider.client, "protocol", "openai")
+    metrics.MODEL_CALL_SECONDS.observe(latency, protocol=protocol, model=provider.model, role=role)
+    metrics.PROMPT_TOKENS.inc(usage.prompt_tokens, model=provider.model, role=role)
+    metrics.COMPLETION_TOKENS.inc(usage.completion_tokens, model=provider.model, role=role)
+    metrics.record_run_usage(run_id, usage.prompt_tokens + usage.completion_tokens, cost)
+    if run_id:
+        run_store.record_model_call(
+            run_id=run_id, agent_name=tracing.current_agent_id(), role=role,
+            provider=provider.name, model=provider.model, ok=True, latency_seconds=latency,
+            prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens, cost_usd=cost,
+        )
+    with _stats_lock:
+        stats = _role_stats.setdefault(role, RoleStats())
+        stats.calls += 1
+        stats.latency_seconds += latency
+        stats.prompt_tokens += usage.prompt_tokens
+        stats.completion_tokens += usage.completion_tokens
+        stats.cost_usd += cost
+
+
+def role_stats() -> dict[str, dict[str, Any]]:
+    """Per-role call count, errors, mean latency, tokens and estimated cost since startup."""
+    with _stats_lock:
+        return {
+            role: {
+                **asdict(stats),
+                "mean_latency_seconds": stats.latency_seconds / stats.calls if stats.calls else 0.0,
+            }
+            for role, stats in _role_stats.items()
+        }
+
+
+@dataclass
+class _Provider:
+    name: str
+    model: str
+    client: ChatCompletionClient
+
+
+class RoutedModelClient(ChatCompletionClient):
+    """Sends each call to the healthiest configured provider and fails over to the next.
+
+    A provider is demoted for this client's role when its recent error rate on that role passes
+    ROUTING_MAX_ERROR_RATE or its median latency is more than ROUTING_LATENCY_FACTOR times
+    slower than another provider's on the same role.
+    A demoted provider is tried first again for one call every ROUTING_PROBE_SECONDS; the
+    other providers remain as failover for that call. Latency, tokens and cost are recorded per role.
+    """
+
+    def __init__(self, *, role: str, providers: Sequence[_Provider]) -> None:
+        if not providers:
+            raise ValueError("RoutedModelClient needs at least one provider")
+        self._role = role
+        self._providers = list(providers)
+        # Streamed calls are not recorded; the pipeline only uses create()
+        self._recording = cassette.mode() == "record"
+
+    @property
+    def role(self) -> str:
+        return self._role
+
+    @property
+    def capabilities(self) -> dict[str, Any]:
+        return MODEL_INFO
+
+    @property
+    def model_info(self) -> dict[str, Any]:
+        return MODEL_INFO
+
+    def _is_degraded(self, provider: _Provider, fastest: Optional[float]) -> bool:
+        health = _health_for(provider.name, self._role)
+        if health.error_rate() > ROUTING_MAX_ERROR_RATE:
+            return True
+        latency = health.median_latency()
+        return latency is not None and fastest is not None and latency > fastest * ROUTING_LATENCY_FACTOR
+
+    def _ordered_providers(self, probe: bool = True) -> list[_Provider]:
+        if len(self._providers) == 1:
+            return self._providers
+        latencies = [_health_for(p.name, self._role).median_latency() for p in self._providers]
+        known = [latency for latency in latencies if latency is not None]
+        fastest = min(known) if known else None
+        degraded = {p.name for p in self._providers if self._is_degraded(p, fastest)}
+        # Half-open: a demoted provider only gets fresh samples if it is sent a call now and then
+        probing = next(
+            (
+                p.name for p in self._providers
+                if probe and p.name in degraded and _health_for(p.name, self._role).claim_probe()
+            ),
+            None,
+        )
+        # Stable sort keeps the configured preference among equally healthy providers
+        return sorted(self._providers, key=lambda p: (p.name != probing, p.name in degraded))
+
+    async def create(
+        self,
+        messages: Sequence[Any],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: bool | type[BaseModel] | None = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Any = None,
+    ) -> CreateResult:
+        last_error: Optional[Exception] = None
+        attempts: list[dict[str, Any]] = []
+        call_started = time.monotonic()
+        providers = self._ordered_providers()
+        for attempt, provider in enumerate(providers, start=1):
+            started = time.monotonic()
+            try:
+                with tracing.span(
+                    "llm.call", role=self._role, provider=provider.name, model=provider.model
+                ) as attributes:
+                    result = await provider.client.create(
+                        messages,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        json_output=json_output,
+                        extra_create_args=extra_create_args,
+                        cancellation_token=cancellation_token,
+                    )
+                    attributes["prompt_tokens"] = result.usage.prompt_tokens
+                    attributes["completion_tokens"] = result.usage.completion_tokens
+            except Exception as e:
+                _record_call(self._role, provider, time.monotonic() - started)
+                attempts.append(_attempt(provider, started, e))
+                logger.warning(f"Model call failed on {provider.name} ({self._role}): {e}")
+                if attempt < len(providers):
+                    metrics.PROVIDER_FAILOVERS.inc(role=self._role)
+                last_error = e
+                continue
+            _record_call(self._role, provider, time.monotonic() - started, result.usage)
+            if self._recording:
+                attempts.append(_attempt(provider, started))
+                cassette.record_call(
+                    role=self._role, messages=messages, attempts=attempts,
+                    latency=time.monotonic() - call_started, result=result, error=None,
+                )
+            return result
+        if self._recording:
+            cassette.record_call(
+                role=self._role, messages=messages, attempts=attempts,
+                latency=time.monotonic() - call_started, result=None, error=str(last_error),
+            )
+        raise last_error
+
+    def create_stream(
+        self,
+        messages: Sequence[Any],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: bool | type[BaseModel] | None = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Any = None,
+    ) -> AsyncGenerator[str | CreateResult, None]:
+        # Streams can't be replayed on another provider once chunks are out, so only pick the best one
+        provider = self._ordered_providers(probe=False)[0]
+
+        async def stream() -> AsyncGenerator[str | CreateResult, None]:
+            started = time.monotonic()
+            try:
+                async for chunk in provider.client.create_stream(
+                    messages,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                ):
+                    if isinstance(chunk, CreateResult):
+                        _record_call(self._role, provider, time.monotonic() - started, chunk.usage)
+                    yield chunk
+            except Exception:
+                _record_call(self._role, provider, time.monotonic() - started)
+                raise
+
+        return stream()
+
+    async def close(self) -> None:
+        for provider in self._providers:
+            await provider.client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return _sum_usage(p.client.actual_usage() for p in self._providers)
+
+    def total_usage(self) -> RequestUsage:
+        return _sum_usage(p.client.total_usage() for p in self._providers)
+
+    def cache_usage(self) -> PromptCacheUsage:
+        total = PromptCacheUsage()
+        for provider in self._providers:
+            usage = prompt_cache_usage(provider.client)
+            if usage is not None:
+                total.cached_prompt_tokens += usage.cached_prompt_tokens
+                total.cache_creation_tokens += usage.cache_creation_tokens
+        return total
+
+    def count_tokens(
+        self, messages: Sequence[Any], *, tools: Sequence[Any] = []
+    ) -> int:
+        return self._providers[0].client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(
+        self, messages: Sequence[Any], *, tools: Sequence[Any] = []
+    ) -> int:
+        return self._providers[0].client.remaining_tokens(messages, tools=tools)
+
+
+def _attempt(provider: _Provider, started: float, error: Optional[Exception] = None) -> dict[str, Any]:
+    return {
+        "provider": provider.name,
+        "model": provider.model,
+        "protocol": getattr(provider.client, "protocol", "openai"),
+        "latency": time.monotonic() - started,
+        "error": None if error is None else str(error),
+    }
+
+
+def _sum_usage(usages: Iterable[RequestUsage]) -> RequestUsage:
+    prompt_tokens = 0
+    completion_tokens = 0
+    for usage in usages:
+        prompt_tokens += usage.prompt_tokens
+        completion_tokens += usage.completion_tokens
+    return RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def prompt_cache_usage(model_client: ChatCompletionClient) -> Optional[PromptCacheUsage]:
+    cache_usage = getattr(model_client, "cache_usage", None)
+    return cache_usage() if callable(cache_usage) else None
+
+
+def _role_model(prefix: str, role: str, default: str) -> str:
+    # e.g. OPENCODE_GO_MODEL_CODEGEN, falling back to OPENCODE_GO_MODEL
+    return os.getenv(f"{prefix}_MODEL_{role.upper()}") or os.getenv(f"{prefix}_MODEL", default)
+
+
+def _openrouter_provider(role: str, temperature: float, api_key: str) -> _Provider:
+    model = _role_model("OPENROUTER", role, DEFAULT_OPENROUTER_MODEL)
+    return _Provider(
+        name="openrouter",
+        model=model,
+        client=OpenRouterClient(
+            model=model,
             base_url=OPENROUTER_BASE_URL,
-            api_key=_env_required("OPENROUTER_API_KEY"),
+            api_key=api_key,
             model_info=MODEL_INFO,
             temperature=temperature,
+        ),
+    )
+
+
+def _opencode_go_provider(
+    role: str, temperature: float, api_key: str, cache_prompt_prefix: bool
+) -> _Provider:
+    model = _role_model("OPENCODE_GO", role, DEFAULT_OPENCODE_GO_MODEL)
+    return _Provider(
+        name="opencode_go",
+        model=model,
+        client=OpenCodeGoAutoClient(
+            model=model,
+            openai_base_url=OPENCODE_GO_OPENAI_BASE_URL,
+            anthropic_base_url=OPENCODE_GO_ANTHROPIC_BASE_URL,
+            api_key=api_key,
+            temperature=temperature,
+            api_style=os.getenv("OPENCODE_GO_API_STYLE", "auto"),
+            cache_prompt_prefix=cache_prompt_prefix,
+        ),
+    )
+
+
+def create_model_client(
+    *, temperature: float, role: str = MODEL_ROLE_IDEA, cache_prompt_prefix: bool = False
+) -> ChatCompletionClient:
+    """Create the configured chat client for a role (codegen, idea or refine).
+
+    Each role can use its own model via OPENROUTER_MODEL_<ROLE> / OPENCODE_GO_MODEL_<ROLE>.
+    MODEL_CASSETTE_MODE=record/replay records calls to, or serves them from, a cassette file
+    (see main/cassette.py). USE_FAKE_MODEL=true swaps in the offline FakeChatCompletionClient (FAKE_MODEL_* settings).
+    Otherwise USE_OPENROUTER picks the preferred provider; when the other provider's key is also set
+    (and MODEL_FAILOVER is not false) calls fail over to it.
+
+    cache_prompt_prefix marks the system prompt and first user turn as cache breakpoints
+    on the Anthropic protocol; OpenAI-style providers cache a stable prefix on their own.
+    """
+    # Library callers (persona pool, batch workers) may not have gone through an entry point
+    startup.init()
+    if cassette.mode() == "replay":
+        replayed = cassette.ReplayChatCompletionClient(role=role, model_info=MODEL_INFO)
+        return RoutedModelClient(role=role, providers=[_Provider(name="replay", model="replay", client=replayed)])
+
+    if startup.env_bool("USE_FAKE_MODEL", default=False):
+        from main.fake_model_client import FakeChatCompletionClient, FakeModelConfig
+
+        fake = FakeChatCompletionClient(
+            role=role, config=FakeModelConfig.from_env(), model_info=MODEL_INFO
         )
+        return RoutedModelClient(role=role, providers=[_Provider(name="fake", model="fake", client=fake)])
 
-    return OpenCodeGoAutoClient(
-        model=os.getenv("OPENCODE_GO_MODEL", DEFAULT_OPENCODE_GO_MODEL),
-        openai_base_url=OPENCODE_GO_OPENAI_BASE_URL,
-        anthropic_base_url=OPENCODE_GO_ANTHROPIC_BASE_URL,
-        api_key=_env_required("OPENCODE_GO_API_KEY"),
-        temperature=temperature,
-        api_style=os.getenv("OPENCODE_GO_API_STYLE", "auto"),
+    use_openrouter = startup.env_bool("USE_OPENROUTER", default=False)
+    builders = {
+        "openrouter": lambda api_key: _openrouter_provider(role, temperature, api_key),
+        "opencode_go": lambda api_key: _opencode_go_provider(
+            role, temperature, api_key, cache_prompt_prefix
+        ),
+    }
+    api_key_names = {"openrouter": "OPENROUTER_API_KEY", "opencode_go": "OPENCODE_GO_API_KEY"}
+    primary, secondary = (
+        ("openrouter", "opencode_go") if use_openrouter else ("opencode_go", "openrouter")
     )
+    providers = [builders[primary](_env_required(api_key_names[primary]))]
+    secondary_key = os.getenv(api_key_names[secondary])
+    if secondary_key and startup.env_bool("MODEL_FAILOVER", default=True):
+        providers.append(builders[secondary](secondary_key))
+    return RoutedModelClient(role=role, providers=providers)
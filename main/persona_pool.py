@@ -0,0 +1,207 @@
+import ast
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from main import constants
+from main import metrics
+
+logger = logging.getLogger(__name__)
+
+# Agent code generated by the Creator does not depend on the user's prompt (the prompt is
+# applied afterwards by overriding system_message), so it can be produced ahead of time.
+# Refills are driven by demand: the pool fills once at start, and afterwards only while the
+# app has been used (a take() or a run) within the last max_age_seconds, so an idle
+# deployment stops spending codegen calls on entries nobody takes before they expire.
+
+
+def validate_agent_code(code: str) -> bool:
+    """Check that generated code defines a RoutedAgent subclass named Agent taking a name."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef) or node.name != "Agent":
+            continue
+        bases = {base.id for base in node.bases if isinstance(base, ast.Name)}
+        if "RoutedAgent" not in bases:
+            return False
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef) and item.name == "__init__":
+                return [arg.arg for arg in item.args.args[:2]] == ["self", "name"]
+        return False
+    return False
+
+
+class PersonaPool:
+
+    def __init__(self, *, max_size: int, max_age_seconds: float, retry_seconds: float) -> None:
+        self._max_size = max_size
+        self._max_age_seconds = max_age_seconds
+        self._retry_seconds = retry_seconds
+        self._entries: deque[tuple[float, str]] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._active_runs = 0
+        self._last_demand: Optional[float] = None
+        self._hits = 0
+        self._misses = 0
+        self._generated = 0
+        self._rejected = 0
+        self._expired = 0
+        self._below_target_since: Optional[float] = None
+        self._last_generation_seconds: Optional[float] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._last_demand = time.monotonic()
+            self._mark_below_target()
+            self._thread = threading.Thread(target=self._run_producer, name="persona-pool", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    def take(self) -> Optional[str]:
+        """Pop the oldest non-expired agent definition, or None when the pool is empty."""
+        with self._lock:
+            self._last_demand = time.monotonic()
+            self._prune_expired()
+            if not self._entries:
+                self._misses += 1
+                metrics.PERSONA_POOL_LOOKUPS.inc(result="miss")
+                return None
+            _, code = self._entries.popleft()
+            self._hits += 1
+            self._mark_below_target()
+        metrics.PERSONA_POOL_LOOKUPS.inc(result="hit")
+        self._wakeup.set()
+        return code
+
+    @contextmanager
+    def run_in_progress(self):
+        """Pause refills while a pipeline run is using the model provider."""
+        with self._lock:
+            self._active_runs += 1
+            self._last_demand = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active_runs -= 1
+            self._wakeup.set()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._prune_expired()
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "generated": self._generated,
+                "rejected": self._rejected,
+                "expired": self._expired,
+                "refill_lag_seconds": (
+                    time.monotonic() - self._below_target_since
+                    if self._below_target_since is not None else 0.0
+                ),
+                "last_generation_seconds": self._last_generation_seconds,
+            }
+
+    def _prune_expired(self) -> None:
+        cutoff = time.monotonic() - self._max_age_seconds
+        while self._entries and self._entries[0][0] < cutoff:
+            self._entries.popleft()
+            self._expired += 1
+            self._mark_below_target()
+
+    def _in_demand(self) -> bool:
+        return self._last_demand is not None and time.monotonic() - self._last_demand < self._max_age_seconds
+
+    def _mark_below_target(self) -> None:
+        if self._below_target_since is None and len(self._entries) < self._max_size and self._in_demand():
+            self._below_target_since = time.monotonic()
+
+    def _needs_refill(self) -> bool:
+        with self._lock:
+            self._prune_expired()
+            if not self._in_demand():
+                # Idle: not refilling is intended, so it doesn't count as refill lag
+                self._below_target_since = None
+                return False
+            return self._active_runs == 0 and len(self._entries) < self._max_size
+
+    def _run_producer(self) -> None:
+        asyncio.run(self._produce())
+
+    async def _produce(self) -> None:
+        # Imported here because the Creator itself draws from this pool
+        from main.creator import generate_agent_code
+        from main.model_client import create_model_client
+
+        try:
+            model_client = create_model_client(
+                temperature=1.0, role=constants.MODEL_ROLE_CODEGEN, cache_prompt_prefix=True
+            )
+        except Exception as e:
+            logger.warning(f"Persona pool disabled: {e}")
+            return
+        try:
+            while not self._stopped.is_set():
+                # Cleared before the check so a take() that lands in between still wakes us
+                self._wakeup.clear()
+                if not self._needs_refill():
+                    await asyncio.to_thread(self._wakeup.wait, self._retry_seconds)
+                    continue
+                started = time.monotonic()
+                try:
+                    code = await generate_agent_code(model_client)
+                except Exception as e:
+                    logger.warning(f"Persona pool refill failed: {e}")
+                    metrics.CODEGEN_FAILURES.inc(stage="generate")
+                    await asyncio.to_thread(self._stopped.wait, self._retry_seconds)
+                    continue
+                with self._lock:
+                    self._last_generation_seconds = time.monotonic() - started
+                    if not isinstance(code, str) or not validate_agent_code(code):
+                        self._rejected += 1
+                        metrics.CODEGEN_FAILURES.inc(stage="validate")
+                        continue
+                    self._entries.append((time.monotonic(), code))
+                    self._generated += 1
+                    if len(self._entries) >= self._max_size:
+                        self._below_target_since = None
+        finally:
+            await model_client.close()
+
+
+_pool = PersonaPool(
+    max_size=constants.PERSONA_POOL_SIZE,
+    max_age_seconds=constants.PERSONA_POOL_MAX_AGE_SECONDS,
+    retry_seconds=constants.PERSONA_POOL_RETRY_SECONDS,
+)
+
+metrics.PERSONA_POOL_SIZE.set_function(lambda: _pool.stats()["size"])
+metrics.PERSONA_POOL_REFILL_LAG_SECONDS.set_function(lambda: _pool.stats()["refill_lag_seconds"])
+
+start = _pool.start
+stop = _pool.stop
+take = _pool.take
+run_in_progress = _pool.run_in_progress
+stats = _pool.stats
@@ -1,84 +1,187 @@
 import asyncio
-import glob
 import json
+import logging
 import os
+import socket
 import sys
-from typing import Tuple, Optional
+import time
+from typing import TYPE_CHECKING, Tuple, Optional
 
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
-from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost, GrpcWorkerAgentRuntime
-from autogen_core import AgentId
-
-from main.creator import Creator
-from main import messages
-from main.upload_to_gcp import upload_to_gcp
+from main import metrics
+from main import persona_pool
+from main import run_planner
+from main import run_store
+from main import similarity
+from main import startup
+from main import tracing
 from main import constants
 
+# Autogen, the model SDKs and GCS are imported on first run, not when the module loads
+if TYPE_CHECKING:
+    from autogen_core import AgentId, AgentRuntime
+
 HOW_MANY_AGENTS = constants.TOTAL_AGENTS_CREATED_SIMULTANEOUSLY
 
+logger = logging.getLogger(__name__)
+
+
+async def _create_and_message(
+    worker: "AgentRuntime", creator_id: "AgentId", i: int, prompt: str, bounce_probability: Optional[float] = None
+):
+    from main import messages
 
-async def _create_and_message(worker: GrpcWorkerAgentRuntime, creator_id: AgentId, i: int, prompt: str):
+    started = time.monotonic()
     try:
         payload = json.dumps({
             "filename": f"agent{i}.py",
             "prompt": prompt,
+            "bounce_probability": bounce_probability,
         })
-        result = await worker.send_message(messages.Message(content=payload), creator_id)
-        ideas_dir = os.path.join(os.path.dirname(__file__), os.pardir, "ideas")
-        ideas_dir = os.path.abspath(ideas_dir)
-        if not os.path.isdir(ideas_dir):
-            os.makedirs(ideas_dir)
-        with open(os.path.join(ideas_dir, f"idea{i}.md"), "w", encoding="utf-8") as f:
-            f.write(result.content)
+        request = messages.Message(
+            content=payload, run_id=tracing.current_run_id(), trace_parent=tracing.current_span_id()
+        )
+        result = await worker.send_message(request, creator_id)
+        metrics.AGENT_SECONDS.observe(time.monotonic() - started)
+        if result.duplicate_of:
+            logger.info(f"Dropped idea from agent{i}: near-duplicate of {result.duplicate_of}")
+            return
+        run_store.record_idea(tracing.current_run_id(), f"agent{i}", result.content)
     except Exception as e:
-        print(f"Failed to run worker {i} due to exception: {e}")
+        logger.warning(f"Failed to run worker {i} due to exception: {e}")
+
+
+def _free_local_address() -> str:
+    # Each run gets its own gRPC host so concurrent runs don't collide on one port
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("localhost", 0))
+        return f"localhost:{s.getsockname()[1]}"
+
 
+async def _run_agents(
+    prompt: str,
+    how_many: int = HOW_MANY_AGENTS,
+    runtime: str = constants.AGENT_RUNTIME,
+    bounce_probability: Optional[float] = None,
+):
+    from autogen_core import AgentId, SingleThreadedAgentRuntime
+    from main import messages
+    from main.creator import Creator
 
-async def _run_agents(prompt: str, how_many: int = HOW_MANY_AGENTS):
-    host = GrpcWorkerAgentRuntimeHost(address="localhost:50051")
-    host.start()
-    worker = GrpcWorkerAgentRuntime(host_address="localhost:50051")
-    await worker.start()
-    await Creator.register(worker, "Creator", lambda: Creator("Creator"))
+    host = None
+    with tracing.span("pipeline.runtime_start", runtime=runtime):
+        if runtime == "grpc":
+            from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost, GrpcWorkerAgentRuntime
+
+            address = _free_local_address()
+            host = GrpcWorkerAgentRuntimeHost(address=address)
+            host.start()
+            worker = GrpcWorkerAgentRuntime(host_address=address)
+            await worker.start()
+        elif runtime == "local":
+            worker = SingleThreadedAgentRuntime()
+            worker.start()
+        else:
+            raise ValueError(f"Unknown agent runtime: {runtime}")
+        await Creator.register(worker, "Creator", lambda: Creator("Creator"))
     creator_id = AgentId("Creator", "default")
-    coroutines = [_create_and_message(worker, creator_id, i, prompt) for i in range(1, how_many + 1)]
-    await asyncio.gather(*coroutines)
+    coroutines = [
+        _create_and_message(worker, creator_id, i, prompt, bounce_probability) for i in range(1, how_many + 1)
+    ]
+    with tracing.span("pipeline.agents", how_many=how_many, bounce_probability=bounce_probability):
+        try:
+            await asyncio.gather(*coroutines)
+        finally:
+            await messages.close_run(tracing.current_run_id())
     try:
         await worker.stop()
-        await host.stop()
-    except Exception as e:
-        print(e)
-
-
-def _read_last_idea_md() -> Optional[str]:
-    ideas_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "ideas"))
-    if not os.path.isdir(ideas_dir):
-        return None
-    paths = glob.glob(os.path.join(ideas_dir, "idea*.md"))
-    if not paths:
-        return None
-    # Choose most recently modified file
-    latest = max(paths, key=os.path.getmtime)
-    try:
-        with open(latest, "r", encoding="utf-8") as f:
-            return f.read()
+        if host is not None:
+            await host.stop()
     except Exception:
-        return None
+        logger.exception("Failed to stop the agent runtime")
 
 
-def run_pipeline(agent_prompt: str, how_many: int = HOW_MANY_AGENTS) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+def run_pipeline(
+    agent_prompt: str,
+    how_many: int = HOW_MANY_AGENTS,
+    run_id: Optional[str] = None,
+    bounce_probability: Optional[float] = None,
+    latency_budget_seconds: Optional[float] = None,
+    token_budget: Optional[int] = None,
+    runtime: str = constants.AGENT_RUNTIME,
+) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """
     Run the full pipeline: create agents, generate ideas, capture last idea content, upload zips to GCP.
 
+    Every stage is recorded in the run store under run_id (generated when not given).
+    bounce_probability overrides each generated agent's own chance of bouncing its idea.
+    Passing latency_budget_seconds and/or token_budget selects auto mode: how_many and
+    bounce_probability are chosen by main.run_planner from recent call statistics.
+    runtime selects the agent runtime ("grpc" or "local").
+
     Returns:
         (agents_signed_url, ideas_signed_url, last_idea_markdown)
     """
-    asyncio.run(_run_agents(agent_prompt, how_many=how_many))
-    last_idea = _read_last_idea_md()
-    urls = upload_to_gcp()  # deletes local idea*.md and agent*.py
-    agents_url = urls.get("agents_signed_url") if isinstance(urls, dict) else None
-    ideas_url = urls.get("ideas_signed_url") if isinstance(urls, dict) else None
+    from main.model_client import role_stats
+    from main.upload_to_gcp import upload_to_gcp
+
+    startup.init()
+    if latency_budget_seconds is not None or token_budget is not None:
+        plan = run_planner.plan_run(latency_budget_seconds=latency_budget_seconds, token_budget=token_budget)
+        logger.info(f"Auto run plan: {plan}")
+        how_many, bounce_probability = plan.how_many, plan.bounce_probability
+    if not 1 <= how_many <= constants.MAX_AGENTS_PER_RUN:
+        raise ValueError(f"how_many must be between 1 and {constants.MAX_AGENTS_PER_RUN}")
+    if bounce_probability is not None and not 0 <= bounce_probability <= constants.MAX_BOUNCE_PROBABILITY:
+        raise ValueError(f"bounce_probability must be between 0 and {constants.MAX_BOUNCE_PROBABILITY}")
+    run_id = run_id or tracing.new_run_id()
+    tracing.start_run(run_id)
+    metrics.start_run(run_id)
+    similarity.start_run(run_id)
+    run_store.start_run(
+        run_id, prompt=agent_prompt, how_many=how_many, runtime=runtime,
+        bounce_probability=bounce_probability,
+    )
+    started = time.monotonic()
+    urls = None
+    error = None
+    try:
+        with tracing.span("pipeline.run", run_id=run_id):
+            with persona_pool.run_in_progress():
+                asyncio.run(_run_agents(
+                    agent_prompt, how_many=how_many, runtime=runtime, bounce_probability=bounce_probability
+                ))
+            last_idea = run_store.last_idea(run_id)
+            with tracing.span("pipeline.upload"):
+                urls = upload_to_gcp(run_id)
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.monotonic() - started
+        breakdown = tracing.finish_run(run_id)
+        usage = metrics.finish_run(run_id, duration)
+        duplicates = similarity.finish_run(run_id)
+        logger.info(f"Persona pool: {persona_pool.stats()}")
+        logger.info(f"Model calls by role: {role_stats()}")
+        logger.info(f"Run {run_id} timing (ms): {breakdown}")
+        logger.info(f"Run {run_id} tokens and cost (USD): {usage}")
+        logger.info(f"Run {run_id} duplicate ideas: {duplicates}")
+        agents_url = urls.get("agents_signed_url") if isinstance(urls, dict) else None
+        ideas_url = urls.get("ideas_signed_url") if isinstance(urls, dict) else None
+        run_store.flush()
+        run_store.finish_run(
+            run_id,
+            status="failed" if error else "succeeded",
+            duration_seconds=duration,
+            timings=breakdown,
+            tokens=usage[0] if usage else None,
+            cost_usd=usage[1] if usage else None,
+            agents_url=agents_url,
+            ideas_url=ideas_url,
+            error=error,
+        )
     return agents_url, ideas_url, last_idea
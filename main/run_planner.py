@@ -0,0 +1,110 @@
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Optional
+
+from main import persona_pool
+from main import run_store
+from main.constants import (
+    AUTO_BOUNCE_STEPS,
+    AUTO_DEFAULT_CALL_SECONDS,
+    AUTO_DEFAULT_CALL_TOKENS,
+    AUTO_LATENCY_QUANTILE,
+    AUTO_RUN_OVERHEAD_SECONDS,
+    AUTO_STATS_WINDOW,
+    MAX_AGENTS_PER_RUN,
+    MODEL_ROLE_CODEGEN,
+    MODEL_ROLE_IDEA,
+    MODEL_ROLE_REFINE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Auto mode: choose the fan-out and bounce probability that fit a latency and token budget.
+# Every agent makes one codegen call (unless the persona pool has code ready) and one idea
+# call; each answer is bounced with probability p, adding a refine call that may bounce again.
+# Agents run in parallel, so latency follows the longest refinement chain and tokens the sum.
+
+
+@dataclass
+class CallEstimate:
+    seconds: float
+    tokens: float
+    samples: int
+
+
+@dataclass
+class RunPlan:
+    how_many: int
+    bounce_probability: float
+    estimated_seconds: float
+    estimated_tokens: int
+    within_budget: bool
+
+
+def call_estimates() -> dict[str, CallEstimate]:
+    """Mean latency and tokens per call for each role, from recent calls in the run store."""
+    estimates = {}
+    for role in (MODEL_ROLE_CODEGEN, MODEL_ROLE_IDEA, MODEL_ROLE_REFINE):
+        try:
+            stats = run_store.recent_call_stats(role, AUTO_STATS_WINDOW)
+        except sqlite3.Error as e:
+            logger.warning(f"Run store read failed: {e}")
+            stats = {"calls": 0}
+        if stats["calls"]:
+            estimates[role] = CallEstimate(stats["mean_latency_seconds"], stats["mean_tokens"], stats["calls"])
+        else:
+            estimates[role] = CallEstimate(AUTO_DEFAULT_CALL_SECONDS[role], AUTO_DEFAULT_CALL_TOKENS[role], 0)
+    return estimates
+
+
+def _longest_chain(how_many: int, bounce_probability: float, quantile: float) -> int:
+    # Refine calls per agent are geometric: P(chain <= k) = 1 - p^(k + 1). Find the k that all
+    # how_many chains stay within with the given probability.
+    if bounce_probability <= 0:
+        return 0
+    hops = 0
+    while (1 - bounce_probability ** (hops + 1)) ** how_many < quantile:
+        hops += 1
+    return hops
+
+
+def estimate_run(
+    how_many: int, bounce_probability: float, estimates: dict[str, CallEstimate], pooled_personas: int = 0
+) -> tuple[float, int]:
+    """Estimated (seconds, tokens) of a run with this fan-out and bounce probability."""
+    codegen_calls = max(0, how_many - pooled_personas)
+    codegen, idea, refine = (estimates[role] for role in (MODEL_ROLE_CODEGEN, MODEL_ROLE_IDEA, MODEL_ROLE_REFINE))
+    seconds = (
+        AUTO_RUN_OVERHEAD_SECONDS
+        + (codegen.seconds if codegen_calls else 0.0)
+        + idea.seconds
+        + _longest_chain(how_many, bounce_probability, AUTO_LATENCY_QUANTILE) * refine.seconds
+    )
+    refine_calls = how_many * bounce_probability / (1 - bounce_probability)
+    tokens = codegen_calls * codegen.tokens + how_many * idea.tokens + refine_calls * refine.tokens
+    return seconds, int(round(tokens))
+
+
+def plan_run(
+    *, latency_budget_seconds: Optional[float] = None, token_budget: Optional[int] = None
+) -> RunPlan:
+    """Widest run (most agents, then most bouncing) whose estimate fits both budgets.
+
+    When nothing fits, returns a single agent without bouncing and within_budget=False.
+    At least one budget is required: without one every run fits and the widest would be picked.
+    """
+    if latency_budget_seconds is None and token_budget is None:
+        raise ValueError("plan_run needs a latency budget, a token budget or both")
+    estimates = call_estimates()
+    pooled = persona_pool.stats()["size"]
+    for how_many in range(MAX_AGENTS_PER_RUN, 0, -1):
+        for bounce_probability in sorted(AUTO_BOUNCE_STEPS, reverse=True):
+            seconds, tokens = estimate_run(how_many, bounce_probability, estimates, pooled)
+            if latency_budget_seconds is not None and seconds > latency_budget_seconds:
+                continue
+            if token_budget is not None and tokens > token_budget:
+                continue
+            return RunPlan(how_many, bounce_probability, seconds, tokens, within_budget=True)
+    seconds, tokens = estimate_run(1, 0.0, estimates, pooled)
+    return RunPlan(1, 0.0, seconds, tokens, within_budget=False)
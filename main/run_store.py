@@ -0,0 +1,407 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+# Embedded record of every pipeline run, kept in SQLite (WAL mode) at RUN_STORE_PATH.
+# Each stage writes its own rows as it completes, so results can be looked up by run id
+# while other runs are still writing, and survive the upload step deleting local files.
+# Rows recorded on the agents' event loops (model calls, hops, duplicates, idea signatures) are queued and
+# inserted in batches by a background thread; readers of those tables flush the queue first.
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+DEFAULT_PATH = os.path.join(ROOT_DIR, "runs.db")
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    how_many INTEGER NOT NULL,
+    bounce_probability REAL,
+    runtime TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    duration_seconds REAL,
+    tokens INTEGER,
+    cost_usd REAL,
+    agents_url TEXT,
+    ideas_url TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE TABLE IF NOT EXISTS agents (
+    run_id TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    code TEXT NOT NULL,
+    pool_hit INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, agent_name)
+);
+CREATE TABLE IF NOT EXISTS ideas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ideas_run_id ON ideas (run_id, id);
+CREATE TABLE IF NOT EXISTS refinement_hops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    from_agent TEXT NOT NULL,
+    to_agent TEXT NOT NULL,
+    duration_ms REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refinement_hops_run_id ON refinement_hops (run_id);
+CREATE TABLE IF NOT EXISTS duplicate_ideas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    duplicate_of TEXT NOT NULL,
+    similarity REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS duplicate_ideas_run_id ON duplicate_ideas (run_id);
+CREATE TABLE IF NOT EXISTS idea_signatures (
+    run_id TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    excerpt TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, agent_name)
+);
+CREATE TABLE IF NOT EXISTS idea_bands (
+    bucket TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    agent_name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idea_bands_bucket ON idea_bands (bucket);
+CREATE TABLE IF NOT EXISTS timings (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total_ms REAL NOT NULL,
+    max_ms REAL NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS model_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    latency_seconds REAL NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS model_calls_run_id ON model_calls (run_id);
+CREATE INDEX IF NOT EXISTS model_calls_role ON model_calls (role, id);
+"""
+
+# Columns added after the table was first created: (table, column, type)
+MIGRATIONS = [
+    ("runs", "bounce_probability", "REAL"),
+]
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready: set[str] = set()
+# Rows written from the model-call and refinement hot paths, inserted by a background thread
+_pending: queue.Queue[tuple[str, tuple[Any, ...]]] = queue.Queue()
+_writer_lock = threading.Lock()
+_writer: Optional[threading.Thread] = None
+
+
+def _path() -> str:
+    return os.getenv("RUN_STORE_PATH") or DEFAULT_PATH
+
+
+def _connection() -> sqlite3.Connection:
+    # One connection per thread: runs execute on their own threads and event loops
+    path = _path()
+    connection = getattr(_local, "connection", None)
+    if connection is not None and _local.path == path:
+        return connection
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with _schema_lock:
+        if path not in _schema_ready:
+            connection.executescript(SCHEMA)
+            for table, column, column_type in MIGRATIONS:
+                columns = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            _schema_ready.add(path)
+    _local.connection = connection
+    _local.path = path
+    return connection
+
+
+def _write(sql: str, *params: Any) -> None:
+    # A failed write loses a row of history, never the run itself
+    try:
+        _connection().execute(sql, params)
+    except sqlite3.Error as e:
+        logger.warning(f"Run store write failed: {e}")
+
+
+def _write_later(sql: str, *params: Any) -> None:
+    # Queued instead of written: these rows are recorded from the agents' event loops
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_run_writer, name="run-store-writer", daemon=True)
+                _writer.start()
+                atexit.register(flush)
+    _pending.put((sql, params))
+
+
+def _run_writer() -> None:
+    while True:
+        batch = [_pending.get()]
+        while len(batch) < 256:
+            try:
+                batch.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            connection = _connection()
+            with connection:
+                connection.execute("BEGIN")
+                for sql, params in batch:
+                    connection.execute(sql, params)
+        except sqlite3.Error as e:
+            logger.warning(f"Run store write failed: {e}")
+        finally:
+            for _ in batch:
+                _pending.task_done()
+
+
+def flush() -> None:
+    """Wait until queued rows (model calls, hops, duplicates, idea signatures) are written."""
+    if _writer is not None:
+        _pending.join()
+
+
+def start_run(
+    run_id: str, *, prompt: str, how_many: int, runtime: str, bounce_probability: Optional[float] = None
+) -> None:
+    _write(
+        "INSERT OR REPLACE INTO runs (run_id, prompt, how_many, bounce_probability, runtime, status, started_at) "
+        "VALUES (?, ?, ?, ?, ?, 'running', ?)",
+        run_id, prompt, how_many, bounce_probability, runtime, time.time(),
+    )
+
+
+def record_agent(run_id: str, agent_name: str, code: str, pool_hit: bool) -> None:
+    _write(
+        "INSERT OR REPLACE INTO agents (run_id, agent_name, code, pool_hit, created_at) VALUES (?, ?, ?, ?, ?)",
+        run_id, agent_name, code, int(pool_hit), time.time(),
+    )
+
+
+def record_idea(run_id: str, agent_name: str, content: str) -> None:
+    _write(
+        "INSERT INTO ideas (run_id, agent_name, content, created_at) VALUES (?, ?, ?, ?)",
+        run_id, agent_name, content, time.time(),
+    )
+
+
+def record_hop(run_id: str, from_agent: str, to_agent: str, duration_ms: float) -> None:
+    _write_later(
+        "INSERT INTO refinement_hops (run_id, from_agent, to_agent, duration_ms, created_at) VALUES (?, ?, ?, ?, ?)",
+        run_id, from_agent, to_agent, duration_ms, time.time(),
+    )
+
+
+def record_duplicate(run_id: str, agent_name: str, duplicate_of: str, similarity: float, outcome: str) -> None:
+    _write_later(
+        "INSERT INTO duplicate_ideas (run_id, agent_name, duplicate_of, similarity, outcome, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        run_id, agent_name, duplicate_of, similarity, outcome, time.time(),
+    )
+
+
+def record_idea_signature(run_id: str, agent_name: str, signature: str, excerpt: str, buckets: list[str]) -> None:
+    """Keep a kept idea's MinHash signature and LSH buckets so later runs can be checked against it."""
+    _write_later(
+        "INSERT OR REPLACE INTO idea_signatures (run_id, agent_name, signature, excerpt, created_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        run_id, agent_name, signature, excerpt, time.time(),
+    )
+    for bucket in buckets:
+        _write_later("INSERT INTO idea_bands (bucket, run_id, agent_name) VALUES (?, ?, ?)", bucket, run_id, agent_name)
+
+
+def record_model_call(
+    *,
+    run_id: str,
+    agent_name: str,
+    role: str,
+    provider: str,
+    model: str,
+    ok: bool,
+    latency_seconds: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cost_usd: float = 0.0,
+) -> None:
+    _write_later(
+        "INSERT INTO model_calls (run_id, agent_name, role, provider, model, ok, latency_seconds, "
+        "prompt_tokens, completion_tokens, cost_usd, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        run_id, agent_name, role, provider, model, int(ok), latency_seconds,
+        prompt_tokens, completion_tokens, cost_usd, time.time(),
+    )
+
+
+def finish_run(
+    run_id: str,
+    *,
+    status: str,
+    duration_seconds: float,
+    timings: dict[str, dict[str, float]],
+    tokens: Optional[int] = None,
+    cost_usd: Optional[float] = None,
+    agents_url: Optional[str] = None,
+    ideas_url: Optional[str] = None,
+    error: Optional[str] = None,
+) -> None:
+    try:
+        connection = _connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ?, duration_seconds = ?, tokens = ?, cost_usd = ?, "
+                "agents_url = ?, ideas_url = ?, error = ? WHERE run_id = ?",
+                (status, time.time(), duration_seconds, tokens, cost_usd, agents_url, ideas_url, error, run_id),
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO timings (run_id, name, count, total_ms, max_ms) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (run_id, name, stage["count"], stage["total_ms"], stage["max_ms"])
+                    for name, stage in timings.items()
+                ],
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Run store write failed: {e}")
+
+
+def get_run(run_id: str) -> Optional[dict[str, Any]]:
+    row = _connection().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def recent_runs(limit: int = 20) -> list[dict[str, Any]]:
+    rows = _connection().execute("SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def ideas(run_id: str) -> list[dict[str, Any]]:
+    rows = _connection().execute(
+        "SELECT agent_name, content, created_at FROM ideas WHERE run_id = ? ORDER BY id", (run_id,)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def last_idea(run_id: str) -> Optional[str]:
+    row = _connection().execute(
+        "SELECT content FROM ideas WHERE run_id = ? ORDER BY id DESC LIMIT 1", (run_id,)
+    ).fetchone()
+    return row["content"] if row is not None else None
+
+
+def agents(run_id: str) -> list[dict[str, Any]]:
+    rows = _connection().execute(
+        "SELECT agent_name, code, pool_hit, created_at FROM agents WHERE run_id = ? ORDER BY agent_name",
+        (run_id,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def agent_names(run_id: str) -> list[str]:
+    rows = _connection().execute("SELECT agent_name FROM agents WHERE run_id = ?", (run_id,)).fetchall()
+    return [row["agent_name"] for row in rows]
+
+
+def refinement_hops(run_id: str) -> list[dict[str, Any]]:
+    flush()
+    rows = _connection().execute(
+        "SELECT from_agent, to_agent, duration_ms, created_at FROM refinement_hops WHERE run_id = ? ORDER BY id",
+        (run_id,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def duplicate_ideas(run_id: str) -> list[dict[str, Any]]:
+    flush()
+    rows = _connection().execute(
+        "SELECT agent_name, duplicate_of, similarity, outcome, created_at FROM duplicate_ideas "
+        "WHERE run_id = ? ORDER BY id",
+        (run_id,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def similar_ideas(buckets: list[str], exclude_run_id: str, limit: int) -> list[dict[str, Any]]:
+    """Most recent ideas from other runs sharing at least one LSH bucket."""
+    flush()
+    placeholders = ", ".join("?" * len(buckets))
+    rows = _connection().execute(
+        "SELECT DISTINCT s.run_id, s.agent_name, s.signature, s.excerpt, s.created_at FROM idea_bands b "
+        "JOIN idea_signatures s ON s.run_id = b.run_id AND s.agent_name = b.agent_name "
+        f"WHERE b.bucket IN ({placeholders}) AND b.run_id != ? ORDER BY s.created_at DESC LIMIT ?",
+        (*buckets, exclude_run_id, limit),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def recent_call_stats(role: str, limit: int) -> dict[str, float]:
+    """Count, mean latency and mean tokens of the last `limit` successful calls for a role."""
+    flush()
+    row = _connection().execute(
+        "SELECT COUNT(*) AS calls, AVG(latency_seconds) AS mean_latency_seconds, "
+        "AVG(prompt_tokens + completion_tokens) AS mean_tokens FROM ("
+        "SELECT latency_seconds, prompt_tokens, completion_tokens FROM model_calls "
+        "WHERE role = ? AND ok = 1 ORDER BY id DESC LIMIT ?)",
+        (role, limit),
+    ).fetchone()
+    return dict(row)
+
+
+def timings(run_id: str) -> dict[str, dict[str, float]]:
+    rows = _connection().execute(
+        "SELECT name, count, total_ms, max_ms FROM timings WHERE run_id = ?", (run_id,)
+    ).fetchall()
+    return {row["name"]: {"count": row["count"], "total_ms": row["total_ms"], "max_ms": row["max_ms"]} for row in rows}
+
+
+def token_usage(run_id: str) -> list[dict[str, Any]]:
+    """Calls, errors, tokens and cost of a run, per role and provider."""
+    flush()
+    rows = _connection().execute(
+        "SELECT role, provider, model, COUNT(*) AS calls, SUM(1 - ok) AS errors, "
+        "SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens, "
+        "SUM(cost_usd) AS cost_usd, AVG(latency_seconds) AS mean_latency_seconds "
+        "FROM model_calls WHERE run_id = ? GROUP BY role, provider, model ORDER BY role, provider",
+        (run_id,),
+    ).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import logging
+import random
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from main import metrics
+from main import run_store
+from main.constants import IDEA_DUPLICATE_ACTION, IDEA_DUPLICATE_SCOPE, IDEA_DUPLICATE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate detection for ideas. Each idea is reduced to a fixed-size MinHash signature
+# over word shingles; locality-sensitive hashing on bands of the signature finds candidate
+# matches without comparing against every stored idea, so lookups stay cheap as the index grows.
+# Each run checks against its own in-memory index; kept ideas are also written to the run store
+# by bucket, which is what IDEA_DUPLICATE_SCOPE = "all" looks up to catch repeats across runs.
+
+SHINGLE_WORDS = 3
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+EXCERPT_CHARS = 300
+# Most recent earlier ideas compared against when IDEA_DUPLICATE_SCOPE is "all"
+STORED_CANDIDATES = 500
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)
+]
+
+DIVERSITY_HINT = """Another agent already came up with a very similar idea:
+
+{excerpt}
+
+Come up with a substantially different business idea: a different problem, customer and use of Agentic AI."""
+
+
+def _shingles(text: str) -> set[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(text: str) -> tuple[int, ...]:
+    """MinHash signature of the text's word shingles."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in _shingles(text)
+    ]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _bands(sig: tuple[int, ...]) -> list[tuple[int, tuple[int, ...]]]:
+    return [(band, sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]) for band in range(LSH_BANDS)]
+
+
+def _stored_buckets(sig: tuple[int, ...]) -> list[str]:
+    # A band's rows hashed into one short key per band for the run store's bucket index
+    return [
+        f"{band}:{hashlib.blake2b(repr(rows).encode('ascii'), digest_size=8).hexdigest()}"
+        for band, rows in _bands(sig)
+    ]
+
+
+def estimated_similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity: the share of signature positions that agree."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERMUTATIONS
+
+
+@dataclass
+class Match:
+    key: str
+    similarity: float
+    excerpt: str
+
+
+class SimilarityIndex:
+    """MinHash LSH index. With 16 bands of 4 rows, pairs above ~0.5 similarity become candidates."""
+
+    def __init__(self, threshold: float = IDEA_DUPLICATE_THRESHOLD) -> None:
+        self._threshold = threshold
+        self._buckets: dict[tuple[int, tuple[int, ...]], list[str]] = {}
+        self._signatures: dict[str, tuple[int, ...]] = {}
+        self._excerpts: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _best_match(self, sig: tuple[int, ...]) -> Optional[Match]:
+        candidates = {key for band in _bands(sig) for key in self._buckets.get(band, ())}
+        best = None
+        for key in candidates:
+            similarity = estimated_similarity(sig, self._signatures[key])
+            if similarity >= self._threshold and (best is None or similarity > best.similarity):
+                best = Match(key=key, similarity=similarity, excerpt=self._excerpts[key])
+        return best
+
+    def add_unless_duplicate(self, key: str, text: str, sig: Optional[tuple[int, ...]] = None) -> Optional[Match]:
+        """Return the closest near-duplicate of text, or index it under key if there is none."""
+        sig = sig or signature(text)
+        # Checked and added under one lock so two identical ideas finishing together can't both pass
+        with self._lock:
+            match = self._best_match(sig)
+            if match is None:
+                self._signatures[key] = sig
+                self._excerpts[key] = text[:EXCERPT_CHARS]
+                for band in _bands(sig):
+                    self._buckets.setdefault(band, []).append(key)
+            return match
+
+
+@dataclass
+class _RunState:
+    index: SimilarityIndex = field(default_factory=SimilarityIndex)
+    checked: int = 0
+    duplicates: int = 0
+    regenerated: int = 0
+    dropped: int = 0
+    # Latest check of each agent's own idea, made before the agent could bounce it (see check())
+    checks: dict[str, Optional[Match]] = field(default_factory=dict)
+
+
+_runs: dict[str, _RunState] = {}
+_runs_lock = threading.Lock()
+
+
+def start_run(run_id: str) -> None:
+    with _runs_lock:
+        _runs[run_id] = _RunState()
+
+
+def finish_run(run_id: str) -> Optional[dict[str, float]]:
+    """Stop checking a run and return its duplicate counts and rate."""
+    with _runs_lock:
+        state = _runs.pop(run_id, None)
+    if state is None:
+        return None
+    return {
+        "checked": state.checked,
+        "duplicates": state.duplicates,
+        "regenerated": state.regenerated,
+        "dropped": state.dropped,
+        "duplicate_rate": state.duplicates / state.checked if state.checked else 0.0,
+    }
+
+
+def _record(run_id: str, state: _RunState, agent_name: str, match: Match, outcome: str) -> None:
+    with _runs_lock:
+        if outcome == "regenerated":
+            state.regenerated += 1
+        else:
+            state.dropped += 1
+    metrics.IDEA_DUPLICATES.inc(outcome=outcome)
+    run_store.record_duplicate(run_id, agent_name, match.key, match.similarity, outcome)
+
+
+def _best_stored_match(run_id: str, sig: tuple[int, ...]) -> Optional[Match]:
+    best = None
+    for row in run_store.similar_ideas(_stored_buckets(sig), run_id, STORED_CANDIDATES):
+        stored = tuple(int(value) for value in row["signature"].split(","))
+        similarity = estimated_similarity(sig, stored)
+        if similarity >= IDEA_DUPLICATE_THRESHOLD and (best is None or similarity > best.similarity):
+            best = Match(key=f"{row['run_id']}/{row['agent_name']}", similarity=similarity, excerpt=row["excerpt"])
+    return best
+
+
+async def _check(run_id: str, state: _RunState, agent_name: str, idea: str) -> Optional[Match]:
+    sig = signature(idea)
+    if IDEA_DUPLICATE_SCOPE == "all":
+        # Off the event loop: the lookup waits for queued run-store writes and reads SQLite
+        match = await asyncio.to_thread(_best_stored_match, run_id, sig)
+        if match is not None:
+            return match
+    match = state.index.add_unless_duplicate(agent_name, idea, sig)
+    if match is None:
+        run_store.record_idea_signature(
+            run_id, agent_name, ",".join(map(str, sig)), idea[:EXCERPT_CHARS], _stored_buckets(sig)
+        )
+    return match
+
+
+async def check(run_id: str, agent_name: str, idea: str) -> Optional[Match]:
+    """Check an agent's idea as soon as the agent has it, before any refinement is spent on it.
+
+    Called by messages.should_bounce(), which won't bounce a near-duplicate. A kept idea is
+    indexed; either way the result is left for deduplicate() to act on.
+    """
+    with _runs_lock:
+        state = _runs.get(run_id)
+    if state is None:
+        return None
+    match = await _check(run_id, state, agent_name, idea)
+    with _runs_lock:
+        state.checks[agent_name] = match
+    return match
+
+
+async def _checked(run_id: str, state: _RunState, agent_name: str, idea: str) -> Optional[Match]:
+    # Agent code that never calls messages.should_bounce() is checked on its reply instead
+    with _runs_lock:
+        if agent_name in state.checks:
+            return state.checks.pop(agent_name)
+    return await _check(run_id, state, agent_name, idea)
+
+
+async def deduplicate(
+    run_id: str, agent_name: str, idea: str, regenerate: Callable[[str], Awaitable[str]]
+) -> tuple[str, str]:
+    """Act on the near-duplicate check of an agent's reply to the Creator.
+
+    The idea was normally checked by check() before the agent could bounce it, so a duplicate
+    has not been refined. With IDEA_DUPLICATE_SCOPE "all" it is also checked against the ideas
+    kept by earlier runs. A near-duplicate is regenerated once with a diversity hint (IDEA_DUPLICATE_ACTION
+    "regenerate"); if it is still a duplicate, or the action is "drop", it is dropped.
+    Returns (idea, agent whose idea it duplicates, or "" when it was kept); an earlier run's
+    agent is given as "<run_id>/<agent_name>".
+    """
+    with _runs_lock:
+        state = _runs.get(run_id)
+        if state is not None:
+            state.checked += 1
+    if state is None:
+        return idea, ""
+    match = await _checked(run_id, state, agent_name, idea)
+    if match is None:
+        return idea, ""
+    with _runs_lock:
+        state.duplicates += 1
+    logger.info(f"{agent_name}: idea is {match.similarity:.0%} similar to {match.key}'s")
+    if IDEA_DUPLICATE_ACTION == "regenerate":
+        first_match = match
+        idea = await regenerate(DIVERSITY_HINT.format(excerpt=match.excerpt))
+        match = await _checked(run_id, state, agent_name, idea)
+        if match is None:
+            _record(run_id, state, agent_name, first_match, "regenerated")
+            return idea, ""
+    _record(run_id, state, agent_name, match, "dropped")
+    return idea, match.key
@@ -0,0 +1,42 @@
+import logging
+import os
+import threading
+
+# Process-wide setup that used to run as a side effect of importing main.model_client and
+# main.creator. Entry points call init() explicitly; it is idempotent, so library code that
+# needs the environment (create_model_client, run_pipeline) calls it as well.
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def init() -> None:
+    """Load .env into the environment and configure logging, once per process."""
+    global _initialized
+    if _initialized:
+        return
+    with _lock:
+        if _initialized:
+            return
+        from dotenv import load_dotenv
+
+        load_dotenv(override=True)
+        # Quiet by default; LOG_LEVEL=INFO adds per-run summaries, DEBUG per-call detail
+        logging.basicConfig(level=(os.getenv("LOG_LEVEL") or "WARNING").strip().upper())
+        # Autogen logs every runtime event on its own loggers; only pay for that when asked to,
+        # not whenever LOG_LEVEL is lowered
+        logging.getLogger("autogen_core").setLevel(logging.WARNING)
+        if env_bool("AUTOGEN_TRACE_LOGGING"):
+            from autogen_core import TRACE_LOGGER_NAME
+
+            logger = logging.getLogger(TRACE_LOGGER_NAME)
+            logger.addHandler(logging.StreamHandler())
+            logger.setLevel(logging.DEBUG)
+        _initialized = True
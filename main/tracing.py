@@ -0,0 +1,218 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Spans are plain dicts. They are collected per run for the timing breakdown printed by
+# the pipeline, and exported off the hot path by a background thread when either
+# TRACE_JSONL_PATH or OTEL_EXPORTER_OTLP_ENDPOINT is set.
+
+_run_id: contextvars.ContextVar[str] = contextvars.ContextVar("trace_run_id", default="")
+_agent_id: contextvars.ContextVar[str] = contextvars.ContextVar("trace_agent_id", default="")
+_span_id: contextvars.ContextVar[str] = contextvars.ContextVar("trace_span_id", default="")
+
+_runs: dict[str, list[dict[str, Any]]] = {}
+_runs_lock = threading.Lock()
+_exporter_lock = threading.Lock()
+_exporter: Optional["_BackgroundExporter"] = None
+_exporter_configured = False
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_run_id() -> str:
+    return _run_id.get()
+
+
+def current_agent_id() -> str:
+    return _agent_id.get()
+
+
+def current_span_id() -> str:
+    return _span_id.get()
+
+
+def start_run(run_id: str) -> None:
+    with _runs_lock:
+        _runs[run_id] = []
+
+
+def finish_run(run_id: str) -> dict[str, dict[str, float]]:
+    """Stop collecting spans for a run and return total/max duration per span name."""
+    with _runs_lock:
+        spans = _runs.pop(run_id, [])
+    breakdown: dict[str, dict[str, float]] = {}
+    for record in spans:
+        stage = breakdown.setdefault(record["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stage["count"] += 1
+        stage["total_ms"] += record["duration_ms"]
+        stage["max_ms"] = max(stage["max_ms"], record["duration_ms"])
+    return breakdown
+
+
+@contextmanager
+def span(
+    name: str,
+    *,
+    run_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    parent: Optional[str] = None,
+    **attributes: Any,
+):
+    """Time a block as a span of the current run.
+
+    run_id, agent_id and parent override the values inherited from the enclosing span; they
+    are needed where work arrives through the agent runtime, which doesn't carry context.
+    Yields the attribute dict so callers can add results (token counts, sizes) before exit.
+    """
+    tokens = []
+    if run_id is not None:
+        tokens.append((_run_id, _run_id.set(run_id)))
+    if agent_id is not None:
+        tokens.append((_agent_id, _agent_id.set(agent_id)))
+    parent_id = parent if parent is not None else _span_id.get()
+    span_id = secrets.token_hex(8)
+    tokens.append((_span_id, _span_id.set(span_id)))
+    start_time = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000.0
+        record = {
+            "name": name,
+            "run_id": _run_id.get(),
+            "agent_id": _agent_id.get(),
+            "span_id": span_id,
+            "parent_span_id": parent_id,
+            "start_time": start_time,
+            "duration_ms": duration_ms,
+            "status": "error" if error else "ok",
+            "error": error,
+            "attributes": attributes,
+        }
+        for var, token in reversed(tokens):
+            var.reset(token)
+        _emit(record)
+
+
+def _emit(record: dict[str, Any]) -> None:
+    run_id = record["run_id"]
+    if run_id:
+        with _runs_lock:
+            spans = _runs.get(run_id)
+            if spans is not None:
+                spans.append(record)
+    exporter = _get_exporter()
+    if exporter is not None:
+        exporter.submit(record)
+
+
+def _get_exporter() -> Optional["_BackgroundExporter"]:
+    global _exporter, _exporter_configured
+    if _exporter_configured:
+        return _exporter
+    with _exporter_lock:
+        if not _exporter_configured:
+            jsonl_path = os.getenv("TRACE_JSONL_PATH")
+            otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+            if jsonl_path or otlp_endpoint:
+                _exporter = _BackgroundExporter(jsonl_path=jsonl_path, otlp_endpoint=otlp_endpoint)
+            _exporter_configured = True
+    return _exporter
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp_span(record: dict[str, Any]) -> dict[str, Any]:
+    start_ns = int(record["start_time"] * 1e9)
+    attributes = {"run.id": record["run_id"], "agent.id": record["agent_id"], **record["attributes"]}
+    otlp_span = {
+        # Runs without an id still need a valid 16-byte trace id
+        "traceId": record["run_id"] or "0" * 31 + "1",
+        "spanId": record["span_id"],
+        "name": record["name"],
+        "kind": 1,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(start_ns + int(record["duration_ms"] * 1e6)),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in attributes.items() if value is not None and value != ""
+        ],
+        "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1},
+    }
+    if record["parent_span_id"]:
+        otlp_span["parentSpanId"] = record["parent_span_id"]
+    return otlp_span
+
+
+class _BackgroundExporter:
+    """Writes spans from a daemon thread so tracing never blocks on file or network I/O."""
+
+    def __init__(self, *, jsonl_path: Optional[str], otlp_endpoint: Optional[str]) -> None:
+        self._jsonl_path = jsonl_path
+        self._otlp_url = otlp_endpoint.rstrip("/") + "/v1/traces" if otlp_endpoint else None
+        self._queue: queue.SimpleQueue[dict[str, Any]] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict[str, Any]) -> None:
+        self._queue.put(record)
+
+    def _drain(self) -> list[dict[str, Any]]:
+        batch = [self._queue.get()]
+        while len(batch) < 256:
+            try:
+                batch.append(self._queue.get(timeout=0.5))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        import httpx
+
+        http = httpx.Client(timeout=5.0) if self._otlp_url else None
+        while True:
+            batch = self._drain()
+            try:
+                if self._jsonl_path:
+                    with open(self._jsonl_path, "a", encoding="utf-8") as f:
+                        for record in batch:
+                            f.write(json.dumps(record, default=str) + "\n")
+                if http is not None:
+                    http.post(self._otlp_url, json={
+                        "resourceSpans": [{
+                            "resource": {"attributes": [
+                                {"key": "service.name", "value": {"stringValue": "auto-ai-agents-creator"}},
+                            ]},
+                            "scopeSpans": [{
+                                "scope": {"name": "main.tracing"},
+                                "spans": [_to_otlp_span(record) for record in batch],
+                            }],
+                        }],
+                    })
+            except Exception as e:
+                logger.warning(f"Trace export failed: {e}")
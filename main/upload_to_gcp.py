@@ -1,11 +1,15 @@
 import os
-import glob
 import json
 import base64
+import shutil
+import tempfile
 import zipfile
 from datetime import datetime, timezone, timedelta
-from google.cloud import storage
-from google.oauth2 import service_account
+
+from main import metrics
+from main import run_store
+from main import startup
+from main import tracing
 
 def _get_gcp_credentials():
     """Get GCP credentials from environment variables."""
@@ -20,41 +24,81 @@ def _get_gcp_credentials():
             "GCP_PROJECT_ID, GCP_BUCKET_NAME, GCP_SERVICE_KEY"
         )
 
+    from google.oauth2 import service_account
+
     service_key = json.loads(base64.b64decode(gcp_service_key).decode("utf-8"))
     return project_id, bucket_name, service_account.Credentials.from_service_account_info(service_key)
 
+class _FakeBlob:
+    """Local stand-in for a GCS blob, used by load tests and offline runs."""
+
+    def __init__(self, root, name):
+        self.name = name
+        self._path = os.path.join(root, name)
+
+    def upload_from_filename(self, filename):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        shutil.copyfile(filename, self._path)
+
+    def generate_signed_url(self, version, method, expiration):
+        return f"http://fake-storage.local/{self.name}"
+
+class _FakeBucket:
+    """Writes uploads under FAKE_STORAGE_DIR instead of a GCS bucket."""
+
+    def __init__(self):
+        self._root = os.getenv("FAKE_STORAGE_DIR") or os.path.join(tempfile.gettempdir(), "fake-storage")
+
+    def blob(self, name):
+        return _FakeBlob(self._root, name)
+
+def _get_bucket():
+    """Return the GCS bucket, or a local fake when USE_FAKE_STORAGE is set."""
+
+    if startup.env_bool("USE_FAKE_STORAGE"):
+        return _FakeBucket()
+    project_id, bucket_name, credentials = _get_gcp_credentials()
+    client = _get_storage_client(project_id, credentials)
+    return client.get_bucket(bucket_name)
+
 def _get_storage_client(project_id, credentials):
     """Initialize and return a GCP Storage client."""
 
+    # Imported here so the app and fake-storage runs never load the GCS client
+    from google.cloud import storage
+
     return storage.Client(project=project_id, credentials=credentials)
 
-def _create_zip(zip_basename, files):
-    """Create a zip file from a list of files.
+def _create_zip(zip_basename, entries):
+    """Create a zip file in the temp directory from a mapping of archive name to text.
     """
 
-    zip_path = f"{zip_basename}.zip"
+    zip_path = os.path.join(tempfile.gettempdir(), f"{zip_basename}.zip")
     with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        for fp in files:
-            if os.path.isfile(fp):
-                zf.write(fp, arcname=os.path.basename(fp))
+        for arcname, content in entries.items():
+            zf.writestr(arcname, content)
     return zip_path
 
-def _upload_and_cleanup(bucket, file_paths, blob_prefix, zip_basename, timestamp):
+def _upload_and_cleanup(bucket, entries, blob_prefix, zip_basename, suffix):
     """
-    Upload files to GCP bucket and clean up local files.
+    Upload entries to GCP bucket as one zip and clean up the local zip.
     """
 
-    if not file_paths:
+    if not entries:
         return None
 
     # Create zip
-    zip_path = _create_zip(f"{zip_basename}-{timestamp}", file_paths)
+    with tracing.span("upload.zip", files=len(entries)):
+        zip_path = _create_zip(f"{zip_basename}-{suffix}", entries)
 
     try:
         # Upload to GCS
         blob_name = f"{blob_prefix}/{os.path.basename(zip_path)}"
         blob = bucket.blob(blob_name)
-        blob.upload_from_filename(zip_path)
+        zip_bytes = os.path.getsize(zip_path)
+        with tracing.span("upload.blob", blob=blob_name, bytes=zip_bytes):
+            blob.upload_from_filename(zip_path)
+        metrics.UPLOAD_BYTES.inc(zip_bytes, prefix=blob_prefix)
 
         # Generate signed URL
         signed_url = blob.generate_signed_url(
@@ -65,7 +109,7 @@ def _upload_and_cleanup(bucket, file_paths, blob_prefix, zip_basename, timestamp
         return signed_url
     finally:
         # Clean up local files
-        _cleanup_files([zip_path] + file_paths)
+        _cleanup_files([zip_path])
 
 def _cleanup_files(file_paths):
     """Safely remove a list of files."""
@@ -76,45 +120,40 @@ def _cleanup_files(file_paths):
         except OSError:
             pass
 
-def upload_to_gcp():
+def upload_to_gcp(run_id):
     """
-    Main function to upload ideas and agents to GCP Storage.
+    Main function to upload a run's ideas and agents, read from the run store, to GCP Storage.
     """
 
-    # Shared timestamp for both archives (UTC for determinism)
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    # Timestamp (UTC for determinism) plus run id, so concurrent runs never share a blob
+    suffix = f"{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{run_id[:8]}"
 
     # Initialize GCP client
-    project_id, bucket_name, credentials = _get_gcp_credentials()
-    client = _get_storage_client(project_id, credentials)
-    bucket = client.get_bucket(bucket_name)
+    bucket = _get_bucket()
 
     # Process ideas
-    ideas_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../ideas"))
-    idea_files = sorted(glob.glob(os.path.join(ideas_dir, "idea*.md"))) \
-        if os.path.isdir(ideas_dir) else []
+    idea_entries = {
+        f"{idea['agent_name'].replace('agent', 'idea', 1)}.md": idea["content"]
+        for idea in run_store.ideas(run_id)
+    }
 
     ideas_signed_url = _upload_and_cleanup(
         bucket=bucket,
-        file_paths=idea_files,
+        entries=idea_entries,
         blob_prefix="ideas",
         zip_basename="ideas",
-        timestamp=timestamp
+        suffix=suffix
     )
 
     # Process agents
-    main_dir = os.path.abspath(os.path.dirname(__file__))
-    agent_files = [
-        fp for fp in glob.glob(os.path.join(main_dir, "agent*.py"))
-        if os.path.basename(fp) != "agent.py"
-    ]
+    agent_entries = {f"{agent['agent_name']}.py": agent["code"] for agent in run_store.agents(run_id)}
 
     agents_signed_url = _upload_and_cleanup(
         bucket=bucket,
-        file_paths=agent_files,
+        entries=agent_entries,
         blob_prefix="auto-agents",
         zip_basename="auto-agents",
-        timestamp=timestamp
+        suffix=suffix
     )
 
     return {
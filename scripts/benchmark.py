@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+Offline pipeline benchmark using the fake model client.
+
+Measures run_pipeline latency and throughput across agent counts, bounce
+probabilities, runtime backends and concurrent runs. Runs go through the whole
+pipeline (run store, duplicate check, zip and upload to fake storage); only the model
+and the bucket are fakes. One untimed warm-up run per runtime comes first, so imports
+and first-connection costs don't land on the first scenario. Results are written as
+JSON so runs on different commits can be compared; with --baseline the script exits
+non-zero when any scenario's median latency regresses by more than --max-regression.
+
+    uv run python scripts/benchmark.py --output bench.json
+    uv run python scripts/benchmark.py --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+os.environ["USE_FAKE_MODEL"] = "true"
+os.environ["USE_FAKE_STORAGE"] = "true"
+
+
+def _csv(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=_csv(int), default=[1, 5, 10])
+    parser.add_argument("--bounce", type=_csv(float), default=[0.0, 0.25, 0.5])
+    parser.add_argument("--runtimes", type=_csv(str), default=["local", "grpc"])
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per concurrent slot")
+    parser.add_argument("--latency-mean", type=float, default=0.05)
+    parser.add_argument("--latency-jitter", type=float, default=0.25)
+    parser.add_argument("--latency-distribution", default="lognormal")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed p50 slowdown, as a fraction")
+    parser.add_argument("--verbose", action="store_true", help="Keep pipeline output")
+    args = parser.parse_args()
+    # Refined ideas can be bounced again, so a probability of 1 never finishes
+    if any(not 0 <= bounce < 1 for bounce in args.bounce):
+        parser.error("--bounce values must be in [0, 1)")
+    return args
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _run_scenario(run_pipeline, agents: int, bounce: float, runtime: str, concurrency: int, repeat: int) -> dict:
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def slot() -> None:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run_pipeline("Give me an idea", how_many=agents, bounce_probability=bounce, runtime=runtime)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=slot) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        "runs": len(latencies),
+        "p50_seconds": statistics.median(latencies),
+        "p95_seconds": _percentile(latencies, 95),
+        "mean_seconds": statistics.fmean(latencies),
+        "throughput_runs_per_second": len(latencies) / wall,
+    }
+
+
+def _compare(results: list[dict], baseline_path: str, max_regression: float) -> list[str]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {entry["scenario"]: entry for entry in json.load(f)["results"]}
+    regressions = []
+    for entry in results:
+        previous = baseline.get(entry["scenario"])
+        if previous is None:
+            continue
+        ratio = entry["p50_seconds"] / previous["p50_seconds"]
+        if ratio > 1 + max_regression:
+            regressions.append(
+                f"{entry['scenario']}: p50 {previous['p50_seconds']:.3f}s -> {entry['p50_seconds']:.3f}s "
+                f"(+{(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main() -> int:
+    args = _parse_args()
+    os.environ.update({
+        "FAKE_MODEL_LATENCY_DISTRIBUTION": args.latency_distribution,
+        "FAKE_MODEL_LATENCY_MEAN": str(args.latency_mean),
+        "FAKE_MODEL_LATENCY_JITTER": str(args.latency_jitter),
+        "FAKE_MODEL_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_MODEL_ERROR_RATE": str(args.error_rate),
+        "FAKE_MODEL_SEED": str(args.seed),
+    })
+    # Keep benchmark runs out of the real run store and storage
+    store_dir = tempfile.mkdtemp(prefix="bench-run-store-")
+    os.environ["RUN_STORE_PATH"] = os.path.join(store_dir, "runs.db")
+    os.environ["FAKE_STORAGE_DIR"] = os.path.join(store_dir, "storage")
+    from main.pipeline import run_pipeline
+
+    results = []
+    try:
+        for runtime in args.runtimes:
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                run_pipeline("Give me an idea", how_many=1, bounce_probability=0.0, runtime=runtime)
+        for agents, bounce, runtime, concurrency in itertools.product(
+            args.agents, args.bounce, args.runtimes, args.concurrency
+        ):
+            random.seed(args.seed)
+            scenario = f"agents={agents},bounce={bounce},runtime={runtime},concurrency={concurrency}"
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                stats = _run_scenario(run_pipeline, agents, bounce, runtime, concurrency, args.repeat)
+            results.append({"scenario": scenario, **stats})
+            print(
+                f"{scenario:<55} p50 {stats['p50_seconds']:.3f}s  p95 {stats['p95_seconds']:.3f}s  "
+                f"{stats['throughput_runs_per_second']:.2f} runs/s"
+            )
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in {"output", "baseline", "verbose"}},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = _compare(results, args.baseline, args.max_regression)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
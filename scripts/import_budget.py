@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Startup budget check for the app's entry points, based on `python -X importtime`.
+
+Each entry point is imported in a fresh interpreter --repeat times. The fastest
+cumulative import time is compared against its budget. The script also checks that
+heavy dependencies stay deferred: none of the modules in DEFERRED may be imported
+at load time. It exits non-zero when any entry point is over budget or imports a
+deferred module.
+
+    uv run python scripts/import_budget.py
+    uv run python scripts/import_budget.py --budget main.app=3500 --output import_times.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Milliseconds of cumulative import time allowed per entry point. main.app is dominated by
+# gradio itself; main.pipeline is what batch workers import before their first run.
+BUDGETS_MS = {
+    "main.app": 6000,
+    "main.gradio_app": 6000,
+    "main.pipeline": 500,
+}
+
+# Imported on first use only (model SDKs, agent runtime, cloud storage)
+DEFERRED = (
+    "anthropic",
+    "openai",
+    "google.cloud.storage",
+    "autogen_ext.runtimes.grpc",
+    "autogen_ext.models.openai",
+    "autogen_ext.models.anthropic",
+    "main.creator",
+    "main.model_client",
+    "main.upload_to_gcp",
+)
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _budget(value: str) -> tuple[str, float]:
+    module, _, ms = value.partition("=")
+    if not module or not ms:
+        raise argparse.ArgumentTypeError("expected MODULE=MILLISECONDS")
+    return module, float(ms)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=_budget, action="append", default=[], help="Override a budget, MODULE=MS")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per entry point; the fastest counts")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest top-level packages to list")
+    parser.add_argument("--output", help="Write the measurements as JSON")
+    return parser.parse_args()
+
+
+def _import_times(module: str) -> dict[str, tuple[int, int, int]]:
+    """Map each imported module to (self_us, cumulative_us, nesting level)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root_dir, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return times
+
+
+def _measure(module: str, repeat: int, top: int) -> dict:
+    runs = [_import_times(module) for _ in range(repeat)]
+    fastest = min(runs, key=lambda times: times[module][1])
+    heaviest = sorted(
+        ((name, cumulative) for name, (_, cumulative, _) in fastest.items() if "." not in name and name != module),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    return {
+        "cumulative_ms": fastest[module][1] / 1000,
+        "modules": len(fastest),
+        "deferred_imported": [name for name in DEFERRED if name in fastest],
+        "heaviest_ms": {name: cumulative / 1000 for name, cumulative in heaviest},
+    }
+
+
+def main() -> int:
+    args = _parse_args()
+    budgets = {**BUDGETS_MS, **dict(args.budget)}
+    report = {}
+    failures = []
+    for module, budget in budgets.items():
+        stats = _measure(module, args.repeat, args.top)
+        stats["budget_ms"] = budget
+        report[module] = stats
+        status = "ok" if stats["cumulative_ms"] <= budget else "OVER BUDGET"
+        print(f"{module:<18} {stats['cumulative_ms']:8.1f} ms / {budget:.0f} ms  {stats['modules']:>5} modules  {status}")
+        print("    heaviest: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in stats["heaviest_ms"].items()))
+        if stats["cumulative_ms"] > budget:
+            failures.append(f"{module} took {stats['cumulative_ms']:.0f} ms (budget {budget:.0f} ms)")
+        if stats["deferred_imported"]:
+            failures.append(f"{module} imports deferred modules at load: {', '.join(stats['deferred_imported'])}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if failures:
+        print("Startup budget exceeded:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("All entry points within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+"""
+Concurrent-user load test for the Gradio pipeline endpoint.
+
+Starts `python -m main.app` with the fake model and fake storage (or targets --url),
+then drives the queue API with Poisson arrivals at each rate in --rates. For every
+step it reports queue wait, time to first result, run latency percentiles, and the
+server's CPU, memory and open file descriptors. The first rate where throughput falls
+behind arrivals or queue wait outgrows run latency is reported as the saturation point.
+
+    uv run python scripts/load_test.py --rates 0.05,0.1,0.2 --duration 60
+    uv run python scripts/load_test.py --rates 0.2 --profile flame.svg   # needs py-spy
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+import httpx
+from gradio_client import Client
+from gradio_client.utils import Status
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - falls back to /proc on Linux
+    psutil = None
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+API_NAME = "/run_pipeline_wrapper"
+PROMPT = "You are a creative entrepreneur. Come up with a new business idea using Agentic AI."
+
+
+def _csv_floats(value: str) -> list[float]:
+    return [float(item) for item in value.split(",") if item]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=_csv_floats, default=[0.05, 0.1, 0.2, 0.5], help="Arrivals per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--max-users", type=int, default=50, help="Cap on in-flight users per rate")
+    parser.add_argument("--url", help="Target an already running app instead of starting one")
+    parser.add_argument("--pid", type=int, help="Server pid to sample when using --url")
+    parser.add_argument("--fake-latency-mean", type=float, default=0.5, help="Fake model time to first token")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--profile", help="Write a py-spy flame graph (SVG) of the server to this path")
+    parser.add_argument("--server-log", help="File for the started server's output")
+    parser.add_argument("--output", default="load_test_results.json")
+    return parser.parse_args()
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "GRADIO_SERVER_PORT": str(port),
+        "USE_FAKE_MODEL": "true",
+        "USE_FAKE_STORAGE": "true",
+        "FAKE_STORAGE_DIR": tempfile.mkdtemp(prefix="load-test-storage-"),
+        "RUN_STORE_PATH": os.path.join(tempfile.mkdtemp(prefix="load-test-run-store-"), "runs.db"),
+        "FAKE_MODEL_LATENCY_MEAN": str(args.fake_latency_mean),
+        "FAKE_MODEL_SEED": str(args.seed),
+    }
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    server = subprocess.Popen([sys.executable, "-m", "main.app"], cwd=root_dir, env=env, stdout=log, stderr=log)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{url}/metrics", timeout=1.0).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Server did not become ready within 120s")
+
+
+class ResourceSampler:
+    """Samples CPU %, resident memory and open file descriptors of one process."""
+
+    def __init__(self, pid: int, interval: float = 0.5) -> None:
+        self._pid = pid
+        self._interval = interval
+        self._samples: list[tuple[float, float, int]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _cpu_seconds(self) -> float:
+        if psutil is not None:
+            times = psutil.Process(self._pid).cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self._pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def _rss_mb(self) -> float:
+        if psutil is not None:
+            return psutil.Process(self._pid).memory_info().rss / 1e6
+        with open(f"/proc/{self._pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+    def _open_fds(self) -> int:
+        if psutil is not None:
+            return psutil.Process(self._pid).num_fds()
+        return len(os.listdir(f"/proc/{self._pid}/fd"))
+
+    def _run(self) -> None:
+        last_cpu, last_time = self._cpu_seconds(), time.monotonic()
+        while not self._stop.wait(self._interval):
+            try:
+                cpu, now = self._cpu_seconds(), time.monotonic()
+                cpu_percent = 100.0 * (cpu - last_cpu) / (now - last_time)
+                last_cpu, last_time = cpu, now
+                self._samples.append((cpu_percent, self._rss_mb(), self._open_fds()))
+            except (OSError, ProcessLookupError):
+                return
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> dict[str, float]:
+        if not self._samples:
+            return {}
+        cpu, rss, fds = zip(*self._samples)
+        return {
+            "cpu_percent_mean": statistics.fmean(cpu),
+            "cpu_percent_max": max(cpu),
+            "rss_mb_max": max(rss),
+            "open_fds_max": max(fds),
+        }
+
+
+def _has_result(output) -> bool:
+    # The first output is the progress text; the app hides it when it shows the results
+    progress = output[0] if isinstance(output, (list, tuple)) and output else None
+    return isinstance(progress, dict) and progress.get("visible") is False
+
+
+def _one_user(url: str, results: list[dict], lock: threading.Lock) -> None:
+    record: dict[str, Optional[float]] = {"queue_wait": None, "first_result": None, "latency": None, "error": None}
+    submitted = time.monotonic()
+    try:
+        job = Client(url, verbose=False).submit(PROMPT, api_name=API_NAME)
+        while not job.done():
+            elapsed = time.monotonic() - submitted
+            if record["queue_wait"] is None and job.status().code in {
+                Status.PROCESSING, Status.ITERATING, Status.PROGRESS
+            }:
+                record["queue_wait"] = elapsed
+            # Earlier outputs are progress-bar updates, which arrive as soon as the job starts
+            if record["first_result"] is None and any(_has_result(output) for output in job.outputs()):
+                record["first_result"] = elapsed
+            time.sleep(0.05)
+        job.result()
+        record["latency"] = time.monotonic() - submitted
+        record["queue_wait"] = record["queue_wait"] if record["queue_wait"] is not None else 0.0
+        if record["first_result"] is None:
+            record["first_result"] = record["latency"]
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    with lock:
+        results.append(record)
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(pct: float) -> float:
+        return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": ordered[-1]}
+
+
+def _run_step(url: str, rate: float, duration: float, max_users: int, pid: Optional[int], rng: random.Random) -> dict:
+    results: list[dict] = []
+    lock = threading.Lock()
+    users: list[threading.Thread] = []
+    sampler = ResourceSampler(pid) if pid else None
+    started = time.monotonic()
+    if sampler:
+        sampler.__enter__()
+    try:
+        next_arrival = started
+        while next_arrival - started < duration:
+            time.sleep(max(0.0, next_arrival - time.monotonic()))
+            if sum(user.is_alive() for user in users) < max_users:
+                user = threading.Thread(target=_one_user, args=(url, results, lock), daemon=True)
+                user.start()
+                users.append(user)
+            next_arrival += rng.expovariate(rate)
+        for user in users:
+            user.join()
+    finally:
+        if sampler:
+            sampler.__exit__(None, None, None)
+    wall = max(time.monotonic() - started, duration)
+    ok = [record for record in results if record["error"] is None]
+    return {
+        "rate": rate,
+        "arrivals": len(users),
+        "completed": len(ok),
+        "errors": len(results) - len(ok),
+        "error_samples": [record["error"] for record in results if record["error"]][:3],
+        "offered_per_second": len(users) / duration,
+        "throughput_per_second": len(ok) / wall,
+        "queue_wait_seconds": _percentiles([record["queue_wait"] for record in ok]),
+        "first_result_seconds": _percentiles([record["first_result"] for record in ok]),
+        "latency_seconds": _percentiles([record["latency"] for record in ok]),
+        "resources": sampler.summary() if sampler else {},
+    }
+
+
+def _is_saturated(step: dict) -> bool:
+    if step["errors"]:
+        return True
+    # Wall time includes draining the last runs, so allow some slack below the offered rate
+    if step["throughput_per_second"] < 0.8 * step["offered_per_second"]:
+        return True
+    queue_wait = step["queue_wait_seconds"].get("p95", 0.0)
+    run_time = step["latency_seconds"].get("p50", 0.0) - step["queue_wait_seconds"].get("p50", 0.0)
+    return queue_wait > max(run_time, 0.0)
+
+
+def _start_profiler(pid: int, path: str) -> subprocess.Popen:
+    if shutil.which("py-spy") is None:
+        raise RuntimeError("--profile needs py-spy on PATH (pip install py-spy)")
+    return subprocess.Popen(["py-spy", "record", "--pid", str(pid), "--output", path, "--format", "flamegraph"])
+
+
+def main() -> int:
+    args = _parse_args()
+    rng = random.Random(args.seed)
+    server = None
+    pid = args.pid
+    url = args.url
+    if url is None:
+        server, url = _start_server(args)
+        pid = server.pid
+    profiler = _start_profiler(pid, args.profile) if args.profile else None
+    steps = []
+    try:
+        for rate in args.rates:
+            step = _run_step(url, rate, args.duration, args.max_users, pid, rng)
+            step["saturated"] = _is_saturated(step)
+            steps.append(step)
+            latency = step["latency_seconds"]
+            queue_wait = step["queue_wait_seconds"]
+            print(
+                f"rate {rate:>5}/s  done {step['completed']:>3}/{step['arrivals']:<3} errors {step['errors']:<3} "
+                f"queue p95 {queue_wait.get('p95', 0):6.2f}s  latency p50 {latency.get('p50', 0):6.2f}s "
+                f"p95 {latency.get('p95', 0):6.2f}s  cpu {step['resources'].get('cpu_percent_mean', 0):5.1f}%  "
+                f"rss {step['resources'].get('rss_mb_max', 0):6.1f}MB  fds {step['resources'].get('open_fds_max', 0)}"
+                + ("  SATURATED" if step["saturated"] else "")
+            )
+    finally:
+        if profiler is not None:
+            profiler.send_signal(signal.SIGINT)
+            profiler.wait()
+            print(f"Flame graph written to {args.profile}")
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    saturation = next((step["rate"] for step in steps if step["saturated"]), None)
+    print(f"Saturation point: {saturation}/s" if saturation is not None else "No saturation at the tested rates")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "settings": vars(args), "saturation_rate": saturation, "steps": steps}, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())